@@ -1,46 +1,166 @@
 
 import streamlit as st
-import os
-import tempfile
+import hashlib
 import pandas as pd
 
-from src.extractor import extract_requirements
-from src.nlp import (
-    classify_with_llm,
-    explain_classification,
-    score_ambiguity
-)
+from src.export import EXPORT_FORMATS, MATRIX_SHEET, export_bytes
+from src.extractor import LOADERS, iter_requirements, read_table
+from src.jobs import JobManager
+from src.result_store import ResultStore
 from src.traceability import (
+    TraceGraph,
     simulate_traceability_data,
     build_trace_links,
     build_trace_links_llm,
     display_traceability_graph
 )
+from src.dedup import duplicate_report
+from src.metrics import get_metrics
+from src.model_registry import model_stats
+from src.nlp import cascade_label_share
 
 st.set_page_config(page_title="🧠 AI Requirements Assistant", layout="wide")
 st.title("🧠 AI-Based Requirements Engineering Assistant")
 
+@st.cache_resource
+def get_result_store():
+    """Per-requirement results shared by all sessions, so revised specs only re-run what changed"""
+    return ResultStore()
+
+@st.cache_resource
+def get_job_manager():
+    """Background jobs shared by all sessions and reruns, keyed by input content hash"""
+    return JobManager()
+
+SHEET_TYPES = ["xlsx", "xls", "csv"]
+
+# === Background jobs (run outside the script thread, so widget reruns never restart them) ===
+def analyze_document(job, store, data, filename, mime=None):
+    """Extract requirements from an uploaded document and analyze the new/changed ones"""
+    # Requirements stream out of the extractor page by page and are analyzed
+    # as they arrive, so the first results don't wait for the last page
+    records = []
+
+    def stream_requirements():
+        # The upload is parsed straight from memory, no temp-file copy
+        for record in iter_requirements(data, filename, mime):
+            records.append(record)
+            yield record["text"]
+
+    # One fused LLM pass per new or modified requirement feeds all three analysis tabs
+    requirements, analyses, changes = store.analyze_revision(
+        filename,
+        stream_requirements(),
+        progress_callback=lambda done, total: job.report(done, total),
+        result_callback=lambda req, analysis: job.add_partial(analysis)
+    )
+    return {"records": records, "requirements": requirements, "analyses": analyses, "changes": changes}
+
+def link_requirements(job, sr_df, sysr_df, tc_df, use_llm, top_k):
+    if use_llm:
+        return build_trace_links_llm(
+            sr_df, sysr_df, tc_df, top_k=top_k,
+            progress_callback=lambda done, total, text: job.report(done, total, text)
+        )
+    return build_trace_links(sr_df, sysr_df, tc_df)
+
+@st.fragment(run_every=1.0)
+def show_job_progress(job, label):
+    """Poll a running job; once it finishes, rerun the page to render the full results"""
+    if job.finished:
+        st.rerun()
+    snap = job.snapshot()
+    total = max(snap["total"], 1)
+    st.progress(
+        min(snap["done"] / total, 1.0),
+        text=snap["message"] or f"{label} ({snap['done']}/{snap['total']}, {snap['elapsed']:.0f}s)"
+    )
+    if snap["partial"]:
+        st.caption("⏳ Partial results")
+        st.dataframe(pd.DataFrame([
+            {"Requirement": a["requirement"], "Classification": a["label"]}
+            for a in snap["partial"]
+        ]), use_container_width=True)
+
+# === Model status (the model is loaded lazily on first LLM call) ===
+with st.sidebar.expander("🧠 Model status"):
+    stats = model_stats()
+    if stats["loaded"]:
+        st.write(f"Load time: {stats['load_seconds']:.1f}s")
+        if stats["rss_mb"] is not None:
+            st.write(f"Resident memory: {stats['rss_mb']:.0f} MB")
+    else:
+        st.write("Not loaded yet — it loads on the first LLM request.")
+
+# === Performance metrics (per stage, for this server process) ===
+with st.sidebar.expander("📈 Performance metrics"):
+    metrics = get_metrics()
+    snapshot = metrics.snapshot()
+    if snapshot:
+        st.dataframe(pd.DataFrame([
+            {
+                "Stage": name,
+                "Calls": stage["calls"],
+                "Total s": round(stage["seconds"], 3),
+                "Avg s": round(stage["avg_seconds"], 4),
+                "Tokens/s": round(stage.get("completion_tokens_per_s", stage.get("prompt_tokens_per_s", 0.0)), 1),
+                "Cache hit %": round(100 * stage["cache_hit_rate"], 1) if "cache_hit_rate" in stage else None,
+            }
+            for name, stage in sorted(snapshot.items())
+        ]), use_container_width=True, hide_index=True)
+        st.download_button("⬇️ JSON", metrics.to_json(), file_name="reqai_metrics.json")
+        st.download_button("⬇️ Prometheus", metrics.to_prometheus(), file_name="reqai_metrics.prom")
+        if st.button("🔄 Reset metrics"):
+            metrics.reset()
+            st.rerun()
+    else:
+        st.write("No measurements yet.")
+
 # === Upload block ===
 uploaded_file = st.file_uploader(
-    "📤 Upload your requirements file (.docx, .pdf, .txt, .xlsx)",
-    type=["docx", "pdf", "txt", "xlsx"]
+    "📤 Upload your requirements file (.docx, .pdf, .txt, .xlsx, .xls, .csv)",
+    type=[ext.lstrip(".") for ext in LOADERS]
 )
 
 if uploaded_file:
-    with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-        tmp_file.write(uploaded_file.read())
-        file_path = tmp_file.name
+    data = uploaded_file.getvalue()
+    job = get_job_manager().submit(
+        f"analysis:{hashlib.sha256(data).hexdigest()}",
+        analyze_document, get_result_store(), data, uploaded_file.name, uploaded_file.type
+    )
 
     st.info(f"📄 Processing file: {uploaded_file.name}")
-    
-    try:
-        requirements = extract_requirements(file_path, uploaded_file.name)
+
+    if not job.finished:
+        show_job_progress(job, "🧠 Analyzing requirements...")
+    elif job.status == "failed":
+        st.error(f"❌ Error: {job.error.splitlines()[0]}")
+    else:
+        records = job.result["records"]
+        requirements = job.result["requirements"]
+        analyses = job.result["analyses"]
+        changes = job.result["changes"]
 
         if not requirements:
             st.warning("⚠️ No requirements found.")
         else:
             st.success(f"✅ Extracted {len(requirements)} requirements.")
 
+            changed = len(changes["added"]) + len(changes["modified"])
+            if changes["unchanged"] or changes["removed"]:
+                with st.expander(f"🆕 Changes since last revision: {changed} added/modified, {len(changes['removed'])} removed"):
+                    st.write(f"➕ Added: {', '.join(changes['added']) or '—'}")
+                    st.write(f"✏️ Modified: {', '.join(changes['modified']) or '—'}")
+                    st.write(f"➖ Removed: {', '.join(changes['removed']) or '—'}")
+                    st.caption(f"♻️ {len(changes['unchanged'])} unchanged requirements reused without LLM calls.")
+
+            duplicates = pd.DataFrame(duplicate_report(requirements, sources=[f"p. {r['page']}" for r in records]))
+            if not duplicates.empty:
+                n_clusters = duplicates["Cluster"].nunique()
+                with st.expander(f"🧬 Near-duplicate requirements: {len(duplicates)} in {n_clusters} clusters"):
+                    st.caption("Each cluster was analyzed once by the LLM. Consider merging or rewording these requirements.")
+                    st.dataframe(duplicates, use_container_width=True, hide_index=True)
+
             # Create tabbed layout
             tab1, tab2, tab3, tab4 = st.tabs([
                 "🔖 Classification", "💬 Explanation", "⚠️ Ambiguity", "🔁 Traceability Matrix"
@@ -48,44 +168,43 @@ if uploaded_file:
 
             with tab1:
                 st.subheader("🔖 Requirement Classification(FR/NFR)")
-                data = []
-                for req in requirements:
-                    data.append({
-                        "Requirement": req,
-                        "Classification": classify_with_llm(req)
-                    })
-                df = pd.DataFrame(data)
+                df = pd.DataFrame([
+                    {"Requirement": a["requirement"], "Classification": a["label"], "Page": r["page"]}
+                    for r, a in zip(records, analyses)
+                ])
                 st.dataframe(df, use_container_width=True)
+                local = cascade_label_share(analyses)
+                if local:
+                    st.caption(f"🪜 {local:.0%} of labels came from the local classifier "
+                               "(their explanations and ambiguity scores still come from the LLM).")
 
             with tab2:
                 st.subheader("💬 Explanation for Each Classification")
-                expl_data = []
-                for req in requirements:
-                    label = classify_with_llm(req)
-                    explanation = explain_classification(req)
-                    expl_data.append({
-                        "Requirement": req,
-                        "Classification": label,
-                        "Explanation": explanation
-                    })
-                df2 = pd.DataFrame(expl_data)
+                df2 = pd.DataFrame([
+                    {
+                        "Requirement": a["requirement"],
+                        "Classification": a["label"],
+                        "Explanation": a["explanation"]
+                    }
+                    for a in analyses
+                ])
                 st.dataframe(df2, use_container_width=True)
 
             with tab3:
                 st.subheader("⚠️ Ambiguity Detection")
-                amb_data = []
-                for req in requirements:
-                    amb = score_ambiguity(req)
-                    amb_data.append({
-                        "Requirement": req,
-                        "Keyword Matches": ", ".join(amb["vague_terms"]),
-                        "Heuristic Score": amb["keyword_score"],
-                        "LLM Score (0-10)": amb["llm_score"]
-                    })
-                df3 = pd.DataFrame(amb_data)
+                df3 = pd.DataFrame([
+                    {
+                        "Requirement": a["requirement"],
+                        "Keyword Matches": ", ".join(a["vague_terms"]),
+                        "Heuristic Score": a["keyword_score"],
+                        "LLM Score (0-10)": a["llm_score"]
+                    }
+                    for a in analyses
+                ])
                 st.dataframe(df3, use_container_width=True)
 
-        with tab4:
+
+            with tab4:
                 st.subheader("🔁 Traceability Matrix from Uploaded Files")
 
                 st.markdown("""
@@ -97,16 +216,16 @@ if uploaded_file:
 
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    stakeholder_file = st.file_uploader("🧑‍💼 Stakeholder Reqs", type=["xlsx"], key="sr")
+                    stakeholder_file = st.file_uploader("🧑‍💼 Stakeholder Reqs", type=SHEET_TYPES, key="sr")
                 with col2:
-                    system_file = st.file_uploader("⚙️ System Reqs", type=["xlsx"], key="sysr")
+                    system_file = st.file_uploader("⚙️ System Reqs", type=SHEET_TYPES, key="sysr")
                 with col3:
-                    test_file = st.file_uploader("🧪 Test Cases", type=["xlsx"], key="tc")
+                    test_file = st.file_uploader("🧪 Test Cases", type=SHEET_TYPES, key="tc")
 
                 if stakeholder_file and system_file and test_file:
-                    sr_df = pd.read_excel(stakeholder_file)
-                    sysr_df = pd.read_excel(system_file)
-                    tc_df = pd.read_excel(test_file)
+                    sr_df = read_table(stakeholder_file.getvalue(), stakeholder_file.name)
+                    sysr_df = read_table(system_file.getvalue(), system_file.name)
+                    tc_df = read_table(test_file.getvalue(), test_file.name)
 
                     st.success("✅ All files uploaded!")
 
@@ -120,35 +239,92 @@ if uploaded_file:
                     st.dataframe(tc_df, use_container_width=True)
 
                     use_llm = st.checkbox("🧠 Use LLM for smarter linking (slower)", value=False)
+                    top_k = None
+                    if use_llm:
+                        top_k = st.number_input(
+                            "🎯 Candidates per stakeholder requirement sent to the LLM (0 = all, full recall)",
+                            min_value=0, value=10, step=1
+                        ) or None
 
+                    # The matrix is computed once per (inputs, settings) and survives reruns
+                    trace_key = "trace:" + hashlib.sha256(
+                        stakeholder_file.getvalue() + system_file.getvalue() + test_file.getvalue()
+                        + f"{use_llm}:{top_k}".encode("utf-8")
+                    ).hexdigest()
                     if st.button("🔗 Generate Traceability Matrix"):
-                        with st.spinner("🔗 Generating traceability links..."):
-                            if use_llm:
-                                matrix_df = build_trace_links_llm(sr_df, sysr_df, tc_df)
-                            else:
-                                matrix_df = build_trace_links(sr_df, sysr_df, tc_df)
+                        get_job_manager().submit(
+                            trace_key, link_requirements, sr_df, sysr_df, tc_df, use_llm, top_k
+                        )
+                        st.session_state["trace_key"] = trace_key
+
+                    trace_job = get_job_manager().get(st.session_state.get("trace_key", ""))
+                    if trace_job is not None and not trace_job.finished:
+                        show_job_progress(trace_job, "🔗 Generating traceability links...")
+                    elif trace_job is not None and trace_job.status == "failed":
+                        st.error(f"❌ Error: {trace_job.error.splitlines()[0]}")
+                    elif trace_job is not None:
+                        matrix_df = trace_job.result
 
                         st.success("✅ Traceability Matrix Created!")
+                        if "llm_stats" in matrix_df.attrs:
+                            llm_stats = matrix_df.attrs["llm_stats"]
+                            st.caption(
+                                f"🧠 {llm_stats['link_calls']} link checks sent to the LLM, "
+                                f"{llm_stats['link_calls_avoided']} of {llm_stats['candidate_pairs']} pairs "
+                                f"skipped by retrieval pre-filtering."
+                            )
                         st.dataframe(matrix_df, use_container_width=True)
 
+                        trace = TraceGraph.from_matrix(
+                            matrix_df, sysr_ids=sysr_df.iloc[:, 0].tolist(), tc_ids=tc_df.iloc[:, 0].tolist()
+                        )
+                        coverage = trace.coverage()
+                        c1, c2, c3, c4 = st.columns(4)
+                        c1.metric("🧪 SRs tested", f"{coverage['stakeholder_tested']:.0f}%")
+                        c2.metric("⚙️ SRs realised", f"{coverage['stakeholder_realised']:.0f}%")
+                        c3.metric("🔗 SYSRs traced", f"{coverage['system_traced']:.0f}%")
+                        c4.metric("📎 TCs traced", f"{coverage['tests_traced']:.0f}%")
+                        with st.expander("📊 Coverage gaps and impact analysis"):
+                            st.write(f"🚫 Untested stakeholder requirements: {', '.join(map(str, trace.untested_requirements())) or '—'}")
+                            st.write(f"🧩 Orphan test cases: {', '.join(map(str, trace.orphan_test_cases())) or '—'}")
+                            changed = st.selectbox("✏️ Changed system requirement", list(trace.nodes["sysr"]))
+                            if changed is not None:
+                                impact = trace.impact_set(changed)
+                                st.write(f"📋 Affected stakeholder requirements: {', '.join(map(str, impact['stakeholder'])) or '—'}")
+                                st.write(f"🧪 Tests to re-run: {', '.join(map(str, impact['tests'])) or '—'}")
+
                         with st.expander("🕸️ Show Traceability Graph"):
-                            display_traceability_graph(matrix_df)
-
-                        export_format = st.radio("📤 Export format", ["None", "CSV", "Excel"])
-                        if export_format == "CSV":
-                            csv = matrix_df.to_csv(index=False).encode('utf-8')
-                            st.download_button("⬇️ Download CSV", csv, file_name="traceability_matrix.csv")
-                        elif export_format == "Excel":
-                            excel_path = os.path.join(tempfile.gettempdir(), "full_traceability_export.xlsx")
-                            with pd.ExcelWriter(excel_path, engine="openpyxl") as writer:
-                                sr_df.to_excel(writer, sheet_name="Stakeholder Reqs", index=False)
-                                sysr_df.to_excel(writer, sheet_name="System Reqs", index=False)
-                                tc_df.to_excel(writer, sheet_name="Test Cases", index=False)
-                                matrix_df.to_excel(writer, sheet_name="Traceability Matrix", index=False)
-                            with open(excel_path, "rb") as f:
-                                st.download_button("⬇️ Download Excel", f, file_name="full_traceability_export.xlsx")
-                else:
-                    st.info("📥 Please upload all three Excel files to generate the traceability matrix.")
+                            detail = st.radio(
+                                "🔍 Level of detail", ["auto", "clusters", "full"], horizontal=True,
+                                help="Clusters show one node per stakeholder requirement; auto uses them for large graphs."
+                            )
+                            expand = []
+                            if detail != "full":
+                                expand = st.multiselect(
+                                    "➕ Expand stakeholder requirements", matrix_df["Stakeholder Requirement"].tolist()
+                                )
+                            display_traceability_graph(matrix_df, detail=detail, expand=expand)
 
-    except Exception as e:
-        st.error(f"❌ Error: {e}")
+                        export_format = st.radio("📤 Export format", ["None", *EXPORT_FORMATS], horizontal=True)
+                        if export_format != "None":
+                            # Built once per matrix and format in this session, never at a shared path
+                            export_key = f"export:{st.session_state['trace_key']}:{export_format}"
+                            for stale in [k for k in st.session_state if k.startswith("export:") and k != export_key]:
+                                del st.session_state[stale]
+                            if export_key not in st.session_state:
+                                with st.spinner("📦 Preparing export..."):
+                                    st.session_state[export_key] = export_bytes(export_format, {
+                                        "Stakeholder Reqs": sr_df,
+                                        "System Reqs": sysr_df,
+                                        "Test Cases": tc_df,
+                                        MATRIX_SHEET: matrix_df,
+                                    })
+                            file_name = (
+                                "full_traceability_export.xlsx" if export_format == "Excel"
+                                else "traceability_matrix" + EXPORT_FORMATS[export_format]
+                            )
+                            st.download_button(
+                                f"⬇️ Download {export_format}", st.session_state[export_key], file_name=file_name
+                            )
+                else:
+                    st.info("📥 Please upload all three sheets (Excel or CSV) to generate the traceability matrix.")
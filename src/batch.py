@@ -0,0 +1,266 @@
+"""
+Headless batch runner for corpus-scale processing.
+
+    python -m src.batch analyze <input_dir> -o results.jsonl [--parquet results.parquet] [--duplicates dups.csv]
+    python -m src.batch trace <stakeholder.xlsx> <system.xlsx> <tests.xlsx> -o matrix.csv|.parquet|.xlsx
+    python -m src.batch train-cascade [--min-examples 50]
+
+`analyze` appends one JSON line per requirement as results arrive and fsyncs every
+--batch-size lines, so a killed run restarted with the same output file skips
+everything already written.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+from src.extractor import LOADERS, iter_requirements, read_table
+
+SUPPORTED_EXTENSIONS = set(LOADERS)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def find_documents(input_dir, extensions=SUPPORTED_EXTENSIONS):
+    """All supported documents below input_dir, in a stable order"""
+    found = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in extensions:
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+def load_checkpoint(output_path):
+    """
+    Keys (file, index, text_hash) already present in the output file.
+    A trailing partial line from a killed run is truncated away.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[: data.rfind(b"\n") + 1]
+
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        done.add((record["file"], record["index"], record["text_hash"]))
+    return done
+
+
+def _pending_requirements(documents, input_dir, done):
+    """Yield (record, text) for every requirement not yet in the checkpoint"""
+    for path in documents:
+        rel = os.path.relpath(path, input_dir)
+        try:
+            for index, req in enumerate(iter_requirements(path)):
+                key = (rel, index, text_hash(req["text"]))
+                if key in done:
+                    continue
+                yield {
+                    "file": rel,
+                    "index": index,
+                    "text_hash": key[2],
+                    "page": req["page"],
+                    "span": list(req["span"]),
+                }, req["text"]
+        except Exception as e:
+            print(f"❌ Skipping {rel}: {e}", file=sys.stderr)
+
+
+def run_analysis(input_dir, output_path, workers=None, batch_size=None, max_rate=None, parquet_path=None,
+                 dedup=True, duplicates_path=None):
+    """
+    Analyze every requirement of every document in input_dir, resuming from output_path.
+    All pending requirements stream through one analyze_requirements_batch call, so the
+    worker pool (and each worker's model) is set up once per run; results are written as
+    they arrive and fsync'ed every batch_size results. With dedup, near-duplicates
+    anywhere in the run share one LLM analysis.
+    """
+    from src.nlp import analyze_requirements_batch, default_workers
+
+    workers = workers or default_workers()
+    batch_size = batch_size or max(1, workers * 2)
+    documents = find_documents(input_dir)
+    done = load_checkpoint(output_path)
+    print(f"📂 {len(documents)} documents, {len(done)} requirements already done")
+
+    waiting = {}        # text -> records submitted and not yet written
+    analyses = {}       # text -> analysis, for records whose text was already analyzed
+    written = 0
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        def checkpoint():
+            out.flush()
+            os.fsync(out.fileno())
+            # Throughput cap: never exceed max_rate requirements per second
+            if max_rate:
+                ahead = written / max_rate - (time.perf_counter() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+            rate = written / max(time.perf_counter() - start, 1e-9)
+            print(f"✅ {written} requirements analyzed ({rate:.2f}/s)")
+
+        def write(record, analysis):
+            nonlocal written
+            out.write(json.dumps({**record, **analysis}, ensure_ascii=False) + "\n")
+            written += 1
+            if written % batch_size == 0:
+                checkpoint()
+
+        def texts():
+            # Each distinct text is analyzed once; repeats are written when it finishes
+            for record, text in _pending_requirements(documents, input_dir, done):
+                if text in analyses:
+                    write(record, analyses[text])
+                elif text in waiting:
+                    waiting[text].append(record)
+                else:
+                    waiting[text] = [record]
+                    yield text
+
+        def on_result(text, analysis):
+            analyses[text] = analysis
+            for record in waiting.pop(text):
+                write(record, analysis)
+
+        analyze_requirements_batch(texts(), workers=workers, result_callback=on_result, dedup=dedup)
+        if written % batch_size:
+            checkpoint()
+
+    if parquet_path:
+        export_parquet(output_path, parquet_path)
+    if duplicates_path:
+        write_duplicate_report(output_path, duplicates_path)
+    return written
+
+
+def write_duplicate_report(jsonl_path, csv_path):
+    """Near-duplicate clusters over every requirement in the JSONL results, as CSV for authors"""
+    import pandas as pd
+    from src.dedup import duplicate_report
+
+    texts, sources = [], []
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            texts.append(record["requirement"])
+            sources.append(f"{record['file']}#{record['index']}")
+    rows = duplicate_report(texts, sources=sources)
+    pd.DataFrame(rows, columns=["Cluster", "Size", "Representative", "Requirement", "Similarity", "Source"]).to_csv(
+        csv_path, index=False
+    )
+    clusters = len({row["Cluster"] for row in rows})
+    print(f"🧬 {len(rows)} near-duplicate requirements in {clusters} clusters written to {csv_path}")
+    return rows
+
+
+def write_metrics(path):
+    """Stage timings of this run as JSON, or Prometheus text for .prom files"""
+    from src.metrics import get_metrics
+
+    metrics = get_metrics()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(metrics.to_prometheus() if path.lower().endswith(".prom") else metrics.to_json())
+    print(f"📈 Metrics written to {path}")
+
+
+def export_parquet(jsonl_path, parquet_path):
+    """Convert the JSONL result stream to Parquet without going through pandas"""
+    import pyarrow.json as pa_json
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa_json.read_json(jsonl_path), parquet_path)
+    print(f"📦 Parquet written to {parquet_path}")
+
+
+def run_trace(sr_path, sysr_path, tc_path, output_path, use_llm=False, top_k=None, method="auto", threshold=None):
+    """Build the traceability matrix from three sheets and write it as CSV, Parquet or Excel"""
+    import pandas as pd
+    from src.export import MATRIX_SHEET, write_export
+    from src.traceability import TraceGraph, build_trace_links, build_trace_links_llm
+
+    sr_df, sysr_df, tc_df = read_table(sr_path), read_table(sysr_path), read_table(tc_path)
+    if use_llm:
+        matrix_df = build_trace_links_llm(sr_df, sysr_df, tc_df, top_k=top_k)
+    else:
+        matrix_df = build_trace_links(sr_df, sysr_df, tc_df, threshold=threshold, method=method, top_k=top_k)
+
+    fmt = {".parquet": "Parquet", ".xlsx": "Excel"}.get(os.path.splitext(output_path)[1].lower(), "CSV")
+    write_export(fmt, {"Stakeholder Reqs": sr_df, "System Reqs": sysr_df, "Test Cases": tc_df,
+                       MATRIX_SHEET: matrix_df}, output_path)
+    print(f"🔁 Traceability matrix with {len(matrix_df)} rows written to {output_path}")
+    coverage = TraceGraph.from_matrix(matrix_df, sysr_df.iloc[:, 0].tolist(), tc_df.iloc[:, 0].tolist()).coverage()
+    print("📊 Coverage: " + ", ".join(f"{name} {value:.1f}%" for name, value in coverage.items()))
+    return matrix_df
+
+
+def train_cascade(store_path=None, min_examples=50):
+    """Refresh the local cascade classifier from the LLM labels in the result store"""
+    from src.nlp import train_label_model
+    from src.result_store import ResultStore
+
+    store = ResultStore(store_path) if store_path else ResultStore()
+    report = train_label_model(store.labelled_examples(), min_examples=min_examples)
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.batch", description="Headless requirements processing")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    analyze = sub.add_parser("analyze", help="Extract and analyze every document in a directory")
+    analyze.add_argument("input_dir")
+    analyze.add_argument("-o", "--output", default="results.jsonl", help="JSONL output / checkpoint file")
+    analyze.add_argument("--parquet", help="Also write the results as Parquet")
+    analyze.add_argument("--workers", type=int, help="Inference worker processes")
+    analyze.add_argument("--batch-size", type=int, help="Results written between checkpoints (fsync)")
+    analyze.add_argument("--max-rate", type=float, help="Maximum requirements per second")
+    analyze.add_argument("--duplicates", help="Write near-duplicate clusters to this CSV")
+    analyze.add_argument("--no-dedup", action="store_true", help="Analyze near-duplicates separately")
+
+    trace = sub.add_parser("trace", help="Build a traceability matrix from three sheets")
+    trace.add_argument("stakeholder")
+    trace.add_argument("system")
+    trace.add_argument("tests")
+    trace.add_argument("-o", "--output", default="traceability_matrix.csv", help=".csv, .parquet or .xlsx")
+    trace.add_argument("--llm", action="store_true", help="Use the LLM linker")
+    trace.add_argument("--top-k", type=int, help="Candidates per stakeholder requirement")
+    trace.add_argument("--method", default="auto", choices=["auto", "difflib", "tfidf"])
+    trace.add_argument("--threshold", type=float, help="Link threshold (default: 0.3 for difflib, 0.04 for tfidf)")
+
+    cascade = sub.add_parser("train-cascade", help="Train the local classifier from stored LLM labels")
+    cascade.add_argument("--store", help="Result store path (default: the app's store)")
+    cascade.add_argument("--min-examples", type=int, default=50)
+
+    for command in (analyze, trace):
+        command.add_argument("--metrics", help="Write stage timings to this .json or .prom file")
+
+    args = parser.parse_args(argv)
+    if args.command == "analyze":
+        run_analysis(args.input_dir, args.output, args.workers, args.batch_size, args.max_rate, args.parquet,
+                     not args.no_dedup, args.duplicates)
+    elif args.command == "train-cascade":
+        train_cascade(args.store, args.min_examples)
+    else:
+        run_trace(args.stakeholder, args.system, args.tests, args.output,
+                  args.llm, args.top_k, args.method, args.threshold)
+    if getattr(args, "metrics", None):
+        write_metrics(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
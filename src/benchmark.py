@@ -0,0 +1,305 @@
+"""
+Offline performance benchmarks — no GGUF model needed.
+
+    python -m src.benchmark -o bench.json [--quick] [--latency 0.01] [--compare baseline.json]
+
+LLM calls go to the deterministic FakeLLM (src/fake_llm.py) with a fixed per-call
+latency, so call counts and pipeline overhead can be measured anywhere. Results are
+JSON; --compare exits with status 1 when a timing regressed by more than --tolerance
+or a pipeline started making more LLM calls than in the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+NOISE_FLOOR_SECONDS = 0.05       # faster cases are too noisy to flag as regressions
+DIFFLIB_MAX_PAIRS = 20_000       # pairwise difflib beyond this takes minutes
+
+WORDS = (
+    "system user data shall must should secure encrypt login report export sensor input "
+    "response time second display alarm log audit access role network backup restore "
+    "configure update notify interface battery storage schedule validate record"
+).split()
+
+
+def _timed(fn, repeat=1):
+    """Best wall time over repeat runs, and the result of the last run"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _record(name, case, seconds, **metrics):
+    return {"name": name, "case": case, "seconds": round(seconds, 6), "metrics": metrics}
+
+
+def _sentence(rng, words=12):
+    return "The " + " ".join(rng.choice(WORDS) for _ in range(words)) + "."
+
+
+def synthetic_requirements_text(size_mb, seed=0):
+    """REQ-XXXX requirements wrapped over several lines (with hyphenation), plus prose"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts, size, n = [], 0, 0
+    while size < target:
+        n += 1
+        if n % 10 == 0:
+            block = _sentence(rng, 30) + "\n\n"
+        else:
+            first, second = _sentence(rng), _sentence(rng)
+            block = f"REQ-{n % 10000:04d}: {first[:-1]} inter-\nface {second}\n"
+        parts.append(block)
+        size += len(block)
+    return "".join(parts)
+
+
+def synthetic_sheets(n_sr, n_sysr, n_tc, seed=0):
+    """Stakeholder / system / test sheets shaped like the data/ Excel files"""
+    import pandas as pd
+
+    rng = random.Random(seed)
+
+    def sheet(prefix, id_column, rows):
+        return pd.DataFrame({
+            id_column: [f"{prefix}-{i:04d}" for i in range(rows)],
+            "Description": [_sentence(rng) for _ in range(rows)],
+        })
+
+    return sheet("SR", "SR_ID", n_sr), sheet("SYSR", "SYSR_ID", n_sysr), sheet("TC", "TC_ID", n_tc)
+
+
+def bench_extraction(data_dir, repeat=1):
+    """Throughput of iter_requirements on every document in data_dir"""
+    from src.extractor import LOADERS, iter_requirements
+
+    results = []
+    warmed = set()
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        ext = os.path.splitext(name)[1].lower()
+        if ext not in LOADERS:
+            continue
+        if ext not in warmed:
+            # Keep the loader's lazy imports (pandas, docx, fitz) out of the timings
+            warmed.add(ext)
+            try:
+                list(iter_requirements(path))
+            except Exception:
+                pass
+        size = os.path.getsize(path)
+        try:
+            seconds, requirements = _timed(lambda: list(iter_requirements(path)), repeat)
+        except Exception as e:
+            results.append({"name": "extract", "case": name, "seconds": None, "metrics": {"skipped": str(e)}})
+            continue
+        results.append(_record(
+            "extract", name, seconds,
+            bytes=size,
+            requirements=len(requirements),
+            mb_per_s=size / 1024 / 1024 / max(seconds, 1e-9),
+            requirements_per_s=len(requirements) / max(seconds, 1e-9),
+        ))
+    return results
+
+
+def bench_segmentation(sizes_mb=(1, 4), repeat=1):
+    """clean_and_split_text on synthetic multi-MB inputs"""
+    from src.extractor import clean_and_split_text
+
+    results = []
+    for size_mb in sizes_mb:
+        text = synthetic_requirements_text(size_mb)
+        seconds, requirements = _timed(lambda: clean_and_split_text(text), repeat)
+        results.append(_record(
+            "segment", f"{size_mb}MB", seconds,
+            requirements=len(requirements),
+            mb_per_s=size_mb / max(seconds, 1e-9),
+        ))
+    return results
+
+
+def bench_trace_links(sizes=((50, 100, 100), (200, 400, 400), (800, 1600, 1600)), repeat=1):
+    """build_trace_links scaling for each similarity method over generated N×M sheets"""
+    from src.traceability import build_trace_links, tfidf_similarity
+
+    tfidf_similarity(["warm up"], ["warm up"])    # keep the scikit-learn import out of the timings
+    results = []
+    for n_sr, n_sysr, n_tc in sizes:
+        sr_df, sysr_df, tc_df = synthetic_sheets(n_sr, n_sysr, n_tc)
+        pairs = n_sr * (n_sysr + n_tc)
+        case = f"{n_sr}x{n_sysr}x{n_tc}"
+        for method in ("difflib", "tfidf"):
+            if method == "difflib" and pairs > DIFFLIB_MAX_PAIRS:
+                results.append({"name": f"trace_{method}", "case": case, "seconds": None,
+                                "metrics": {"pairs": pairs, "skipped": f"more than {DIFFLIB_MAX_PAIRS} pairs"}})
+                continue
+            seconds, matrix_df = _timed(lambda: build_trace_links(sr_df, sysr_df, tc_df, method=method), repeat)
+            links = sum(
+                cell.count(",") + 1 for column in ("System Requirements", "Test Cases")
+                for cell in matrix_df[column] if cell
+            )
+            results.append(_record(f"trace_{method}", case, seconds,
+                                   pairs=pairs, pairs_per_s=pairs / max(seconds, 1e-9), links=links))
+    return results
+
+
+def bench_llm_pipelines(llm, n_requirements=60, trace_size=(20, 40, 40)):
+    """Wall time and LLM call counts of the pipelines that talk to the model"""
+    from src.nlp import analyze_requirements_batch
+    from src.result_store import ResultStore
+    from src.traceability import build_trace_links_llm
+
+    rng = random.Random(0)
+    unique = [f"REQ-{i:04d}: {_sentence(rng)}" for i in range(n_requirements)]
+    requirements = unique + unique[: n_requirements // 5]    # 20% repeated requirements
+
+    def calls():
+        return sum(llm.calls.values())
+
+    results = []
+
+    llm.reset()
+    seconds, _ = _timed(lambda: analyze_requirements_batch(requirements, workers=1))
+    results.append(_record("llm_analyze", f"{len(requirements)} requirements", seconds,
+                           requirements=len(requirements), llm_calls=calls()))
+
+    store = ResultStore(":memory:")
+    store.analyze_revision("bench.docx", unique, progress_callback=lambda d, t: None)
+    revised = list(unique)
+    revised[0] += " Revised."
+    llm.reset()
+    seconds, _ = _timed(lambda: store.analyze_revision("bench.docx", revised, progress_callback=lambda d, t: None))
+    results.append(_record("llm_revision", f"1 of {len(revised)} changed", seconds,
+                           requirements=len(revised), llm_calls=calls()))
+
+    sr_df, sysr_df, tc_df = synthetic_sheets(*trace_size)
+    for top_k in (None, 5):
+        llm.reset()
+        seconds, matrix_df = _timed(
+            lambda: build_trace_links_llm(sr_df, sysr_df, tc_df, top_k=top_k, progress_callback=lambda *a: None)
+        )
+        stats = matrix_df.attrs["llm_stats"]
+        results.append(_record("llm_trace", f"{'x'.join(map(str, trace_size))} top_k={top_k}", seconds,
+                               llm_calls=calls(), link_calls=stats["link_calls"],
+                               explain_calls=stats["explain_calls"]))
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+@contextmanager
+def scoped_environ(**values):
+    """Set environment variables for the duration of a with block, then restore them"""
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run_benchmarks(data_dir="data", quick=False, latency=0.0, repeat=1):
+    """Run every benchmark against the fake LLM and return the report dict"""
+    from src.fake_llm import FakeLLM
+    from src.model_registry import set_llm
+
+    llm = FakeLLM(latency=latency)
+    previous = set_llm(llm)
+    try:
+        # Measure the pipelines themselves, not the response cache or the local classifier
+        with scoped_environ(REQAI_DISABLE_CACHE="1", REQAI_DISABLE_CASCADE="1"):
+            results = []
+            if os.path.isdir(data_dir):
+                results += bench_extraction(data_dir, repeat)
+            results += bench_segmentation((0.25,) if quick else (1, 4), repeat)
+            results += bench_trace_links(((20, 40, 40), (50, 100, 100)) if quick else
+                                         ((50, 100, 100), (200, 400, 400), (800, 1600, 1600)), repeat)
+            results += bench_llm_pipelines(llm, 12 if quick else 60, (5, 10, 10) if quick else (20, 40, 40))
+    finally:
+        set_llm(previous)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": quick,
+            "fake_llm_latency": latency,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Regressions of report against baseline: slower beyond tolerance, or more LLM calls"""
+    previous = {(r["name"], r["case"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get((result["name"], result["case"]))
+        if old is None or result["seconds"] is None or old["seconds"] is None:
+            continue
+        if result["seconds"] > NOISE_FLOOR_SECONDS and result["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append(f"{result['name']} [{result['case']}]: {old['seconds']:.3f}s → {result['seconds']:.3f}s")
+        old_calls, new_calls = old["metrics"].get("llm_calls"), result["metrics"].get("llm_calls")
+        if old_calls is not None and new_calls is not None and new_calls > old_calls:
+            regressions.append(f"{result['name']} [{result['case']}]: {old_calls} → {new_calls} LLM calls")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.benchmark", description="Offline performance benchmarks")
+    parser.add_argument("-o", "--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--data-dir", default="data", help="Documents for the extraction benchmark")
+    parser.add_argument("--quick", action="store_true", help="Small inputs only (smoke test)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake LLM seconds per call")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the best time is kept")
+    parser.add_argument("--compare", help="Baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs. the baseline")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.data_dir, args.quick, args.latency, args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        for r in report["results"]:
+            timing = f"{r['seconds']:.3f}s" if r["seconds"] is not None else r["metrics"].get("skipped")
+            print(f"⏱️ {r['name']:<14} {r['case']:<40} {timing}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"❌ Regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+    return report
+
+
+if __name__ == "__main__":
+    main()
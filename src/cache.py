@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.path.abspath(os.environ.get("REQAI_CACHE_DIR", ".reqai_cache"))
+CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.sqlite")
+
+# Eviction defaults — override via environment for long-running servers
+DEFAULT_MAX_ENTRIES = int(os.environ.get("REQAI_CACHE_MAX_ENTRIES", "100000"))
+DEFAULT_TTL_SECONDS = float(os.environ.get("REQAI_CACHE_TTL", str(30 * 24 * 3600)))
+
+
+class DiskCache:
+    """
+    SQLite-backed key/value cache with TTL and size eviction.
+    Entries are grouped by namespace (e.g. one per model file) so a whole
+    namespace can be invalidated at once.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                   key TEXT PRIMARY KEY,
+                   namespace TEXT NOT NULL,
+                   value TEXT NOT NULL,
+                   created REAL NOT NULL,
+                   accessed REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_ns ON cache(namespace)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached value for key, or None on miss/expiry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value, namespace="default"):
+        """Store a JSON-serialisable value and evict if over capacity"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, namespace, value, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, json.dumps(value), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.ttl:
+            self._conn.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+        if self.max_entries:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if count > self.max_entries:
+                # Least-recently-used entries go first
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def invalidate(self, namespace):
+        """Drop every entry of a namespace; returns the number removed"""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+            return cur.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process plus on-disk size"""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DiskCache:
+    """Process-wide cache instance (created on first use)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache()
+        return _cache
+
+
+def model_identity(model_path: str) -> str:
+    """Identify a model file by name, size and mtime — cheap and changes on re-download"""
+    try:
+        st = os.stat(model_path)
+        return f"{os.path.basename(model_path)}:{st.st_size}:{int(st.st_mtime)}"
+    except OSError:
+        return os.path.basename(model_path)
+
+
+def make_key(prompt: str, model_id: str, temperature, top_p, max_tokens, **extra) -> str:
+    """Content-addressed key: hash of prompt, model identity and sampling parameters"""
+    payload = json.dumps(
+        {
+            "prompt": prompt,
+            "model": model_id,
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+            **extra,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached_invoke(llm, prompt: str, runner=None, **kwargs) -> str:
+    """
+    Drop-in replacement for llm.invoke(prompt) that answers from the disk cache
+    when the same prompt was already run with the same model and sampling settings.
+    runner(prompt, **kwargs) replaces llm.invoke on a miss (e.g. to restore KV state first).
+    Any other kwargs (e.g. the options of a constrained choice) become part of the key.
+    """
+    runner = runner or llm.invoke
+    if os.environ.get("REQAI_DISABLE_CACHE"):
+        return runner(prompt, **kwargs)
+
+    model_id = model_identity(llm.model_path)
+    key = make_key(
+        prompt,
+        model_id,
+        kwargs.get("temperature", llm.temperature),
+        kwargs.get("top_p", llm.top_p),
+        kwargs.get("max_tokens", llm.max_tokens),
+        **{k: v for k, v in kwargs.items() if k not in ("temperature", "top_p", "max_tokens")},
+    )
+    cache = get_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+
+    response = runner(prompt, **kwargs)
+    cache.set(key, response, namespace=model_id)
+    return response
+
+
+def invalidate_model(model_path: str) -> int:
+    """Remove all cached responses produced by the given model file"""
+    return get_cache().invalidate(model_identity(model_path))
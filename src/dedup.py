@@ -0,0 +1,168 @@
+import os
+import re
+
+import numpy as np
+
+from src.result_store import REQ_ID_PREFIX
+
+# Estimated Jaccard similarity of character shingles above which two requirements
+# count as near-duplicates and share one LLM analysis
+DEDUP_THRESHOLD = float(os.environ.get("REQAI_DEDUP_THRESHOLD", "0.8"))
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+
+# Words that flip or weaken a requirement while barely changing its shingles
+NEGATIONS = {"not", "no", "never", "none", "nor", "neither", "without", "cannot"}
+MODALS = {"shall", "should", "must", "may", "might", "will", "would", "can", "could"}
+
+_MASK_32 = np.uint64((1 << 32) - 1)
+
+
+def _permutations(num_perm, seed=0):
+    # Multiply-shift hashing: (a*h + b) mod 2**64, top 32 bits; a is odd
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def normalize_for_dedup(text: str) -> str:
+    """Lower-case words without the requirement ID, punctuation or layout"""
+    return " ".join(re.findall(r"\w+", REQ_ID_PREFIX.sub("", text).lower()))
+
+
+def meaning_markers(text: str) -> frozenset:
+    """Negations, modal verbs and numbers of a requirement, which near-duplicates must share"""
+    text = REQ_ID_PREFIX.sub("", text).lower().replace("’", "'")
+    tokens = re.findall(r"\d+(?:[.,]\d+)*|[a-z]+n't|[a-z]+", text)
+    return frozenset(t for t in tokens if t in NEGATIONS or t in MODALS or t.endswith("n't") or t[0].isdigit())
+
+
+def shingle_hashes(text: str, k=SHINGLE_SIZE) -> np.ndarray:
+    """Distinct 32-bit hashes of the k-byte shingles of the normalized text"""
+    data = np.frombuffer(normalize_for_dedup(text).encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    if len(data) < k:
+        data = np.pad(data, (0, k - len(data)))
+    n = len(data) - k + 1
+    hashes = data[:n].copy()
+    for j in range(1, k):
+        hashes *= np.uint64(257)
+        hashes += data[j:n + j]
+    return np.unique(hashes & _MASK_32)
+
+
+def lsh_params(num_perm=NUM_PERM, threshold=DEDUP_THRESHOLD, recall=0.98):
+    """
+    (bands, rows) for LSH banding: the most rows per band (fewest false candidates)
+    that still make a pair at the threshold a candidate with probability >= recall.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    Incremental MinHash/LSH index that maps every added requirement to a cluster
+    representative: the most similar earlier requirement whose estimated Jaccard
+    similarity is at least threshold and that has the same meaning_markers (so "shall
+    not" or "5 seconds" never shares the analysis of "shall" or "2 seconds"), or itself.
+    Only representatives are stored in the LSH buckets and the markers are part of the
+    bucket keys, so each add costs O(bands) lookups plus a few signature comparisons,
+    whatever the corpus size — even for boilerplate that differs only by a number. results is free for callers to keep per-representative outputs
+    (e.g. LLM analyses) across add() calls.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, num_perm=NUM_PERM, k=SHINGLE_SIZE, seed=0):
+        self.threshold = threshold
+        self.k = k
+        self._a, self._b = _permutations(num_perm, seed)
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = {}           # representative position -> signature
+        self.texts = []
+        self.representative = []        # position -> representative position
+        self.similarity = []            # position -> estimated similarity to its representative
+        self.results = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text, self.k)
+        return ((np.outer(hashes, self._a) + self._b) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature, markers):
+        # Requirements with different markers never become candidates of each other
+        prefix = "\0".join(sorted(markers)).encode("utf-8") + b"\1"
+        bands = signature[:self.bands * self.rows].reshape(self.bands, self.rows)
+        return [prefix + row.tobytes() for row in bands]
+
+    def add(self, text: str) -> int:
+        """Index text and return the position of its representative"""
+        position = len(self.texts)
+        self.texts.append(text)
+        signature = self.signature(text)
+        markers = meaning_markers(text)
+
+        keys = self._band_keys(signature, markers)
+        candidates = set()
+        for bucket, key in zip(self._buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        best, best_similarity = position, 1.0
+        if candidates:
+            candidates = sorted(candidates)
+            matches = (np.stack([self._signatures[c] for c in candidates]) == signature).mean(axis=1)
+            top = int(matches.argmax())
+            if matches[top] >= self.threshold:
+                best, best_similarity = candidates[top], float(matches[top])
+
+        if best == position:
+            self._signatures[position] = signature
+            for bucket, key in zip(self._buckets, keys):
+                bucket.setdefault(key, []).append(position)
+        self.representative.append(best)
+        self.similarity.append(best_similarity)
+        return best
+
+    def clusters(self) -> dict:
+        """{representative position: [member positions]} for clusters with more than one requirement"""
+        members = {}
+        for position, representative in enumerate(self.representative):
+            members.setdefault(representative, []).append(position)
+        return {rep: group for rep, group in members.items() if len(group) > 1}
+
+
+def build_index(texts, threshold=DEDUP_THRESHOLD) -> NearDuplicateIndex:
+    index = NearDuplicateIndex(threshold)
+    for text in texts:
+        index.add(text)
+    return index
+
+
+def near_duplicate_clusters(texts, threshold=DEDUP_THRESHOLD) -> list:
+    """Lists of positions of near-identical texts, each starting with its representative"""
+    return list(build_index(texts, threshold).clusters().values())
+
+
+def duplicate_report(texts, threshold=DEDUP_THRESHOLD, sources=None) -> list:
+    """
+    One row per requirement that belongs to a near-duplicate cluster, for authors to
+    merge or reword: cluster number (largest first), representative, requirement and
+    similarity. sources (optional, parallel to texts) adds where each one was found.
+    """
+    index = build_index(texts, threshold)
+    rows = []
+    for number, (rep, group) in enumerate(sorted(index.clusters().items(), key=lambda c: -len(c[1])), 1):
+        for position in group:
+            row = {
+                "Cluster": number,
+                "Size": len(group),
+                "Representative": index.texts[rep],
+                "Requirement": index.texts[position],
+                "Similarity": round(index.similarity[position], 3),
+            }
+            if sources is not None:
+                row["Source"] = sources[position]
+            rows.append(row)
+    return rows
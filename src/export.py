@@ -0,0 +1,86 @@
+import os
+import tempfile
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_FORMATS = {"CSV": ".csv", "Excel": ".xlsx", "Parquet": ".parquet"}
+MATRIX_SHEET = "Traceability Matrix"
+
+
+def _iter_rows(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Rows as plain tuples, converted one chunk at a time"""
+    for start in range(0, len(df), chunk_rows):
+        yield from df.iloc[start:start + chunk_rows].itertuples(index=False, name=None)
+
+
+def _cell(value):
+    # Excel has no NaN and rejects control characters (common in PDF-extracted text)
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
+
+
+def write_xlsx(sheets, target):
+    """
+    Write {sheet name: DataFrame} to an .xlsx path or binary file object.
+    openpyxl's write-only mode streams rows out instead of building the cell model,
+    so memory stays flat however many rows there are.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for name, df in sheets.items():
+        sheet = workbook.create_sheet(title=name[:31])
+        sheet.append([str(column) for column in df.columns])
+        for row in _iter_rows(df):
+            sheet.append([_cell(value) for value in row])
+    workbook.save(target)
+
+
+def write_csv(df, target, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Write a DataFrame to a CSV path chunk by chunk"""
+    with open(target, "w", encoding="utf-8", newline="") as f:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            df.iloc[start:start + chunk_rows].to_csv(f, header=start == 0, index=False)
+
+
+def write_parquet(df, target, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Write a DataFrame to Parquet, one row group per chunk"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(target, schema) as writer:
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_export(fmt, sheets, target, main=MATRIX_SHEET):
+    """Excel gets every sheet; CSV and Parquet get the main one"""
+    if fmt == "Excel":
+        write_xlsx(sheets, target)
+    elif fmt == "CSV":
+        write_csv(sheets[main], target)
+    elif fmt == "Parquet":
+        write_parquet(sheets[main], target)
+    else:
+        raise ValueError(f"❌ Unsupported export format: {fmt}")
+
+
+def export_bytes(fmt, sheets, main=MATRIX_SHEET) -> bytes:
+    """
+    Build an export in a private temp file (unique per call, so concurrent sessions
+    never share a path) and return its contents; the file is removed afterwards.
+    """
+    fd, path = tempfile.mkstemp(prefix="reqai_export_", suffix=EXPORT_FORMATS[fmt])
+    os.close(fd)
+    try:
+        write_export(fmt, sheets, path, main)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
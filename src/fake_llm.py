@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from src.nlp import LABELS
+
+
+class FakeLLM:
+    """
+    Deterministic offline stand-in for the LlamaCpp handle (REQAI_LLM_BACKEND=fake).
+    Answers are derived from a hash of the prompt, so repeated runs are identical,
+    and every call sleeps for a configurable latency to mimic inference cost.
+    """
+
+    def __init__(self, latency=None, tokens_per_second=None):
+        self.model_path = "fake-llm"
+        self.temperature = 0.0
+        self.top_p = 1.0
+        self.max_tokens = 128
+        self.latency = float(os.environ.get("REQAI_FAKE_LATENCY", "0") if latency is None else latency)
+        self.tokens_per_second = tokens_per_second
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(prompt):
+        return int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+
+    def _spend(self, kind, completion_tokens):
+        with self._lock:
+            self.calls[kind] += 1
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += completion_tokens / self.tokens_per_second
+        if delay:
+            time.sleep(delay)
+
+    def invoke(self, prompt, max_tokens=None, **kwargs):
+        digest = self._digest(prompt)
+        if '"ambiguity"' in prompt:        # fused analysis (with or without the label)
+            response = json.dumps({
+                "label": LABELS[digest % len(LABELS)],
+                "explanation": f"Deterministic answer {digest % 1000}.",
+                "ambiguity": digest % 11,
+            })
+        else:
+            response = f"Deterministic answer {digest % 1000}."
+        self._spend("invoke", len(response.split()))
+        return response
+
+    def choose(self, prompt, options):
+        """Constrained answer: one of options, picked by the prompt hash"""
+        self._spend("choose", 1)
+        return options[self._digest(prompt) % len(options)], 1.0 / len(options)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
@@ -0,0 +1,103 @@
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """
+    A unit of background work with progress and partial results that the UI can poll.
+    The job function receives the Job as its first argument and reports through it.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.status = "queued"      # queued → running → done | failed
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.partial = []           # results available so far, in arrival order
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def report(self, done, total, message=""):
+        with self._lock:
+            self.done, self.total = done, total
+            if message:
+                self.message = message
+
+    def add_partial(self, item):
+        with self._lock:
+            self.partial.append(item)
+
+    def snapshot(self):
+        """Consistent copy of the progress fields for rendering"""
+        with self._lock:
+            return {
+                "status": self.status,
+                "done": self.done,
+                "total": self.total,
+                "message": self.message,
+                "partial": list(self.partial),
+                "elapsed": (self.finished_at or time.time()) - self.started if self.started else 0.0,
+            }
+
+
+class JobManager:
+    """
+    Runs jobs on a thread pool, deduplicated by key (e.g. a file hash), and keeps the
+    most recent results so reruns and other sessions pick them up instead of recomputing.
+    """
+
+    def __init__(self, max_workers=2, max_jobs=32):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reqai-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_jobs = max_jobs
+
+    def submit(self, key, fn, *args, **kwargs) -> Job:
+        """Start fn(job, *args, **kwargs) unless a job with this key exists (failed jobs are retried)"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != "failed":
+                self._jobs.move_to_end(key)
+                return job
+
+            job = Job(key)
+            self._jobs[key] = job
+            self._evict()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def _evict(self):
+        # Only finished jobs are dropped; running ones must stay reachable
+        for key in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[key].finished:
+                del self._jobs[key]
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{e}\n{traceback.format_exc()}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
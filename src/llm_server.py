@@ -0,0 +1,149 @@
+import asyncio
+import json
+import math
+import os
+import threading
+
+# OpenAI-compatible llama.cpp server (`llama-server -m model.gguf --parallel 8 --cont-batching`)
+SERVER_URL = os.environ.get("REQAI_LLM_SERVER_URL", "http://127.0.0.1:8080")
+SERVER_MODEL = os.environ.get("REQAI_LLM_SERVER_MODEL", "")
+SERVER_CONCURRENCY = int(os.environ.get("REQAI_LLM_SERVER_CONCURRENCY", "8"))
+SERVER_TIMEOUT = float(os.environ.get("REQAI_LLM_SERVER_TIMEOUT", "120"))
+SERVER_RETRIES = int(os.environ.get("REQAI_LLM_SERVER_RETRIES", "3"))
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class ServerError(RuntimeError):
+    pass
+
+
+class ServerLLM:
+    """
+    LLM handle backed by a shared inference server instead of an in-process model
+    (REQAI_LLM_BACKEND=server). One pooled httpx.AsyncClient runs on a private event
+    loop thread; invoke()/choose() may be called from any number of threads and their
+    requests are multiplexed over it, so the server's continuous batching sees them
+    together. At most max_concurrency requests are in flight — further callers wait.
+    Failed connections, timeouts and 408/429/5xx answers are retried with backoff.
+    """
+
+    concurrent = True
+
+    def __init__(self, base_url=SERVER_URL, model=SERVER_MODEL, max_concurrency=SERVER_CONCURRENCY,
+                 timeout=SERVER_TIMEOUT, retries=SERVER_RETRIES, backoff=0.5,
+                 temperature=0.1, top_p=0.9, max_tokens=128):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.model_path = f"server:{model or 'default'}"
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.temperature = temperature
+        self.top_p = top_p
+        self.max_tokens = max_tokens
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Event loop thread and client, created on first request"""
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+            import httpx
+
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="reqai-llm-server", daemon=True).start()
+
+            async def setup():
+                self._client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 10.0)),
+                    limits=httpx.Limits(max_connections=self.max_concurrency,
+                                        max_keepalive_connections=self.max_concurrency),
+                )
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            asyncio.run_coroutine_threadsafe(setup(), loop).result()
+            self._loop = loop
+            return loop
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._start()).result()
+
+    async def _post(self, path, payload):
+        import httpx
+
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt
+            try:
+                async with self._semaphore:
+                    response = await self._client.post(path, json=payload)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+                error = ServerError(f"❌ LLM server answered {response.status_code}: {response.text[:200]}")
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            except httpx.TransportError as e:     # connection refused/reset, timeouts
+                error = ServerError(f"❌ LLM server unreachable at {self.base_url}: {e!r}")
+            if attempt < self.retries:
+                await asyncio.sleep(delay)
+        raise error
+
+    def _payload(self, prompt, max_tokens, **kwargs):
+        payload = {
+            "prompt": prompt,
+            "max_tokens": self.max_tokens if max_tokens is None else max_tokens,
+            "temperature": kwargs.pop("temperature", self.temperature),
+            "top_p": kwargs.pop("top_p", self.top_p),
+            # Reuse the KV cache of a slot that already holds a shared prompt prefix
+            "cache_prompt": True,
+            **kwargs,
+        }
+        if self.model:
+            payload["model"] = self.model
+        return payload
+
+    async def ainvoke(self, prompt, max_tokens=None, **kwargs) -> str:
+        data = await self._post("/v1/completions", self._payload(prompt, max_tokens, **kwargs))
+        return data["choices"][0]["text"]
+
+    async def achoose(self, prompt, options):
+        """Grammar-constrained completion: the server can only answer with one of options"""
+        grammar = "root ::= " + " | ".join(json.dumps(option) for option in options)
+        payload = self._payload(prompt, max(len(option) for option in options), temperature=0.0,
+                                grammar=grammar, logprobs=1)
+        choice = (await self._post("/v1/completions", payload))["choices"][0]
+        text = choice["text"].strip()
+        return (text if text in options else options[0]), _first_token_prob(choice)
+
+    def invoke(self, prompt, max_tokens=None, **kwargs) -> str:
+        return self._run(self.ainvoke(prompt, max_tokens, **kwargs))
+
+    def choose(self, prompt, options):
+        return self._run(self.achoose(prompt, list(options)))
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+
+def _first_token_prob(choice):
+    """Probability of the first answer token, if the server returned logprobs"""
+    logprobs = choice.get("logprobs") or {}
+    try:
+        if logprobs.get("token_logprobs"):              # OpenAI completions shape
+            return math.exp(logprobs["token_logprobs"][0])
+        if logprobs.get("content"):                     # llama.cpp chat-style shape
+            return math.exp(logprobs["content"][0]["logprob"])
+    except (KeyError, IndexError, TypeError):
+        pass
+    return None
@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+PROMETHEUS_PREFIX = "reqai"
+
+
+class Metrics:
+    """
+    Thread-safe per-stage counters: calls, wall time, slowest call, and any extra
+    counts a stage reports (prompt_tokens, completion_tokens, cache_hits, pages ...).
+    Work done in pool processes is shipped back with drain() and added with merge().
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, **counts):
+        with self._lock:
+            stage = self._stages.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            for key, value in counts.items():
+                stage[key] = stage.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, name, **counts):
+        """Time a block; the yielded dict can be filled with counts while it runs"""
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.record(name, time.perf_counter() - start, **counts)
+
+    def merge(self, stages):
+        """Add raw stage totals (e.g. from drain() in a worker process)"""
+        with self._lock:
+            for name, other in stages.items():
+                stage = self._stages.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+                for key, value in other.items():
+                    if key == "max_seconds":
+                        stage[key] = max(stage[key], value)
+                    else:
+                        stage[key] = stage.get(key, 0) + value
+
+    def drain(self):
+        """Raw totals since the last drain/reset, then start from zero"""
+        with self._lock:
+            stages, self._stages = self._stages, {}
+        return stages
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def snapshot(self):
+        """Per-stage totals plus derived averages and token throughput"""
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+        for stage in stages.values():
+            seconds = stage["seconds"]
+            stage["avg_seconds"] = seconds / stage["calls"] if stage["calls"] else 0.0
+            for tokens in ("prompt_tokens", "completion_tokens"):
+                if tokens in stage:
+                    stage[f"{tokens}_per_s"] = stage[tokens] / seconds if seconds else 0.0
+            if "cache_hits" in stage or "cache_misses" in stage:
+                lookups = stage.get("cache_hits", 0) + stage.get("cache_misses", 0)
+                stage["cache_hit_rate"] = stage.get("cache_hits", 0) / lookups if lookups else 0.0
+        return stages
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """Prometheus text exposition format, one sample per stage and field"""
+        stages = self.snapshot()
+        fields = sorted({key for stage in stages.values() for key in stage})
+        lines = []
+        for field in fields:
+            # Totals only grow; averages, rates and maxima can go either way
+            derived = field == "max_seconds" or field.startswith("avg_") or field.endswith(("_per_s", "_rate"))
+            metric = f"{prefix}_stage_{field}" if derived else f"{prefix}_stage_{field}_total"
+            lines.append(f"# TYPE {metric} {'gauge' if derived else 'counter'}")
+            for name, stage in sorted(stages.items()):
+                if field in stage:
+                    lines.append(f'{metric}{{stage="{name}"}} {float(stage[field]):.6g}')
+        return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Process-wide metrics registry"""
+    return _metrics
+
+
+def record(name, seconds, **counts):
+    _metrics.record(name, seconds, **counts)
+
+
+def stage(name, **counts):
+    return _metrics.stage(name, **counts)
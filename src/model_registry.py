@@ -0,0 +1,340 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from src.cache import cached_invoke
+from src.metrics import record, stage
+
+# One model file and one set of load-time settings shared by every module
+MODEL_PATH = os.path.abspath(
+    os.environ.get("REQAI_MODEL_PATH", "models/mistral-7b-instruct-v0.1.Q4_K_M.gguf")
+)
+MODEL_SETTINGS = {
+    "n_ctx": 2048,
+    "temperature": 0.1,
+    "top_p": 0.9,
+    "max_tokens": 128,
+    "n_gpu_layers": 0,
+    "verbose": False,
+}
+
+# "llama_cpp" loads MODEL_PATH; "server" talks to a shared llama.cpp server (see src/llm_server.py);
+# "fake" is a deterministic offline stub (see src/fake_llm.py)
+LLM_BACKEND = os.environ.get("REQAI_LLM_BACKEND", "llama_cpp")
+
+# Each saved prefix state holds the KV cache of the prefix tokens (tens of MB for a 7B model)
+PREFIX_STATE_SLOTS = int(os.environ.get("REQAI_PREFIX_STATE_SLOTS", "4"))
+
+_llm = None
+_lock = threading.Lock()
+_infer_lock = threading.Lock()
+_prefix_states = OrderedDict()
+_grammars = {}
+_stats = {
+    "loaded": False,
+    "model_path": MODEL_PATH,
+    "load_seconds": None,
+    "rss_mb_before_load": None,
+    "rss_mb_after_load": None,
+}
+
+
+def _rss_mb():
+    """Resident set size of this process in MB (None if it can't be read)"""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return None
+
+
+def configure(**settings):
+    """Override load-time settings (e.g. n_threads) before the model is first used"""
+    with _lock:
+        if _llm is not None:
+            raise RuntimeError("❌ Model already loaded — configure() must run before first use.")
+        MODEL_SETTINGS.update(settings)
+
+
+def get_llm():
+    """Return the process-wide LlamaCpp handle, loading it on first call"""
+    global _llm
+    if _llm is not None:
+        return _llm
+    with _lock:
+        if _llm is None and LLM_BACKEND == "fake":
+            from src.fake_llm import FakeLLM
+
+            _llm = FakeLLM()
+            _stats.update(model_path=_llm.model_path, load_seconds=0.0, loaded=True)
+        elif _llm is None and LLM_BACKEND == "server":
+            from src.llm_server import ServerLLM
+
+            _llm = ServerLLM(
+                model=os.environ.get("REQAI_LLM_SERVER_MODEL", os.path.basename(MODEL_PATH)),
+                temperature=MODEL_SETTINGS["temperature"],
+                top_p=MODEL_SETTINGS["top_p"],
+                max_tokens=MODEL_SETTINGS["max_tokens"],
+            )
+            _stats.update(model_path=_llm.base_url, load_seconds=0.0, loaded=True)
+        elif _llm is None:
+            from langchain_community.llms import LlamaCpp
+
+            _stats["rss_mb_before_load"] = _rss_mb()
+            start = time.perf_counter()
+            _llm = LlamaCpp(model_path=MODEL_PATH, **MODEL_SETTINGS)
+            _stats["load_seconds"] = time.perf_counter() - start
+            _stats["rss_mb_after_load"] = _rss_mb()
+            _stats["loaded"] = True
+    return _llm
+
+
+def set_llm(llm):
+    """Install a ready-made handle (e.g. a FakeLLM in benchmarks); returns the previous one"""
+    global _llm
+    with _lock:
+        previous, _llm = _llm, llm
+        _prefix_states.clear()
+    return previous
+
+
+def max_concurrency() -> int:
+    """
+    Requests the backend serves at once: 1 for an in-process model (calls are serialized),
+    more for an inference server. Never loads a model to find out.
+    """
+    if _llm is not None:
+        return getattr(_llm, "max_concurrency", 1)
+    if LLM_BACKEND == "server":
+        from src.llm_server import SERVER_CONCURRENCY
+
+        return max(1, SERVER_CONCURRENCY)
+    return 1
+
+
+def _inference_lock(llm):
+    # Backends that handle concurrent requests themselves are not serialized here
+    return nullcontext() if getattr(llm, "concurrent", False) else _infer_lock
+
+
+def map_concurrent(fn, items):
+    """
+    fn over items, results in input order. With a concurrent backend up to
+    max_concurrency() calls are in flight at once; otherwise this is plain map().
+    """
+    workers = max_concurrency()
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reqai-llm") as pool:
+        yield from pool.map(fn, items)
+
+
+def _restore_prefix(client, prefix: str):
+    """
+    Put the llama.cpp context into the state it has right after evaluating prefix.
+    The first time a prefix is seen it is evaluated once and snapshotted; later calls
+    restore the snapshot, and llama.cpp's prefix matching then only evaluates the suffix.
+    """
+    state = _prefix_states.get(prefix)
+    if state is None:
+        with stage("llm.prefix_eval") as counts:
+            tokens = client.tokenize(prefix.encode("utf-8"), add_bos=True, special=True)
+            shared = client.longest_token_prefix(client._input_ids.tolist(), tokens)
+            client.n_tokens = shared
+            client.eval(tokens[shared:])
+            _prefix_states[prefix] = client.save_state()
+            counts["prompt_tokens"] = len(tokens) - shared
+        while len(_prefix_states) > PREFIX_STATE_SLOTS:
+            _prefix_states.popitem(last=False)
+        return
+
+    _prefix_states.move_to_end(prefix)
+    current = client._input_ids.tolist()
+    if client.longest_token_prefix(current, state.input_ids[:state.n_tokens].tolist()) < state.n_tokens:
+        with stage("llm.prefix_restore"):
+            client.load_state(state)
+
+
+def _count_tokens(llm, text: str) -> int:
+    """Token count with the model's tokenizer, or a whitespace estimate for other backends"""
+    client = getattr(llm, "client", None)
+    if hasattr(client, "tokenize"):
+        return len(client.tokenize(text.encode("utf-8"), add_bos=False, special=True))
+    return len(text.split())
+
+
+def _llama_perf(client):
+    """Cumulative (prompt eval ms, prompt tokens, generation ms, generated tokens) of a llama.cpp context"""
+    try:
+        import llama_cpp
+
+        data = llama_cpp.llama_perf_context(client.ctx)
+        return data.t_p_eval_ms, data.n_p_eval, data.t_eval_ms, data.n_eval
+    except Exception:
+        return None
+
+
+def _run_instrumented(llm, text, **params) -> str:
+    """
+    llm.invoke with prompt evaluation and generation recorded as separate stages when
+    llama.cpp exposes its perf counters (otherwise one "llm.generate" stage with token counts).
+    """
+    client = getattr(llm, "client", None)
+    before = _llama_perf(client)
+    start = time.perf_counter()
+    response = llm.invoke(text, **params)
+    elapsed = time.perf_counter() - start
+    after = _llama_perf(client)
+
+    if before is not None and after is not None:
+        delta = [a - b for a, b in zip(after, before)]
+        p_ms, p_tokens, g_ms, g_tokens = delta if min(delta) >= 0 else after
+        record("llm.prompt_eval", p_ms / 1000, prompt_tokens=p_tokens)
+        record("llm.generate", g_ms / 1000, completion_tokens=g_tokens)
+    else:
+        record("llm.generate", elapsed,
+               prompt_tokens=_count_tokens(llm, text), completion_tokens=_count_tokens(llm, response))
+    return response
+
+
+def invoke(prompt: str, max_tokens: int = 128, prefix: str = None, **kwargs) -> str:
+    """
+    Run a prompt on the shared model; per-call settings never trigger a reload.
+    prefix (optional) is the part of prompt shared by many calls — its evaluated
+    state is reused so only the remainder of the prompt is processed.
+    """
+    llm = get_llm()
+    misses = []
+
+    def run(text, **params):
+        misses.append(text)
+        with _inference_lock(llm):
+            client = getattr(llm, "client", None)
+            if prefix and text.startswith(prefix) and hasattr(client, "save_state"):
+                _restore_prefix(client, prefix)
+            return _run_instrumented(llm, text, **params)
+
+    with stage("llm.invoke") as counts:
+        response = cached_invoke(llm, prompt, runner=run, max_tokens=max_tokens, **kwargs)
+        counts["cache_misses" if misses else "cache_hits"] = 1
+    return response
+
+
+def _option_grammar(options):
+    """GBNF grammar whose only sentences are the given options (compiled once per option set)"""
+    key = tuple(options)
+    if key not in _grammars:
+        from llama_cpp import LlamaGrammar
+
+        rule = "root ::= " + " | ".join(json.dumps(option) for option in options)
+        _grammars[key] = LlamaGrammar.from_string(rule, verbose=False)
+    return _grammars[key]
+
+
+def _generate_choice(client, prompt, options, max_tokens):
+    """Grammar-constrained greedy generation: the output can only be one of options"""
+    with stage("llm.generate") as counts:
+        out = client.create_completion(
+            prompt, grammar=_option_grammar(options), max_tokens=max_tokens, temperature=0.0
+        )
+        counts["completion_tokens"] = out.get("usage", {}).get("completion_tokens", 0)
+    text = out["choices"][0]["text"].strip()
+    return text if text in options else options[0]
+
+
+def _last_logits(client):
+    """
+    Next-token logits at the end of the last eval(). llama.cpp keeps logits for the final
+    token of every batch even without logits_all (client.scores is only filled with
+    logits_all=True, and create_completion(logprobs=...) refuses to run without it).
+    """
+    import numpy as np
+
+    pointer = client._ctx.get_logits_ith(-1)
+    return np.ctypeslib.as_array(pointer, shape=(client.n_vocab(),)).astype(np.float64)
+
+
+def _choose_option(client, prompt, options):
+    """
+    The answer comes from grammar-constrained greedy generation, so it is always one of
+    options. The confidence is the softmax over the options' first tokens of the logits
+    at the end of the prompt, read after evaluating only the part of the prompt the
+    context does not already hold. Returns (option, probability of its first token).
+    """
+    import numpy as np
+
+    prompt_tokens = client.tokenize(prompt.encode("utf-8"), add_bos=True, special=True)
+    continuations = {}
+    for option in options:
+        tokens = client.tokenize((prompt + option).encode("utf-8"), add_bos=True, special=True)
+        if tokens[: len(prompt_tokens)] != prompt_tokens or len(tokens) == len(prompt_tokens):
+            # Option merges with the end of the prompt: no clean boundary to score at
+            longest = max(len(client.tokenize(o.encode("utf-8"), add_bos=False)) for o in options)
+            return _generate_choice(client, prompt, options, longest + 1), None
+        continuations[option] = tokens[len(prompt_tokens):]
+
+    # At least one token is evaluated, so the logits belong to the end of this prompt
+    shared = client.longest_token_prefix(client._input_ids.tolist(), prompt_tokens)
+    client.n_tokens = min(shared, len(prompt_tokens) - 1)
+    with stage("llm.prompt_eval", prompt_tokens=len(prompt_tokens) - client.n_tokens):
+        client.eval(prompt_tokens[client.n_tokens:])
+    logits = _last_logits(client)
+
+    first_tokens = sorted({tokens[0] for tokens in continuations.values()})
+    scores = logits[first_tokens]
+    probs = np.exp(scores - scores.max())
+    probs /= probs.sum()
+
+    longest = max(len(tokens) for tokens in continuations.values())
+    option = _generate_choice(client, prompt, options, longest + 1)
+    return option, float(probs[first_tokens.index(continuations[option][0])])
+
+
+def choose(prompt: str, options, prefix: str = None):
+    """
+    Constrained decoding for closed answers (labels, YES/NO, scores): the model can only
+    answer with one of options, generating a few tokens instead of free text.
+    Returns (option, confidence) where confidence is the model's probability for the
+    answer relative to the other options (None if it could not be measured).
+    """
+    llm = get_llm()
+    options = list(options)
+    misses = []
+
+    def run(text, **params):
+        misses.append(text)
+        with _inference_lock(llm):
+            if hasattr(llm, "choose"):
+                # Backends with their own constrained decoding
+                return list(llm.choose(text, options))
+            client = llm.client
+            if prefix and text.startswith(prefix):
+                _restore_prefix(client, prefix)
+            return list(_choose_option(client, text, options))
+
+    with stage("llm.choose") as counts:
+        option, confidence = cached_invoke(llm, prompt, runner=run, max_tokens=0, options=options)
+        counts["cache_misses" if misses else "cache_hits"] = 1
+    return option, confidence
+
+
+def model_stats() -> dict:
+    """Load time and memory footprint of the shared model"""
+    stats = dict(_stats)
+    stats["rss_mb"] = _rss_mb()
+    return stats
@@ -1,76 +1,462 @@
-from langchain_community.llms import LlamaCpp
+import json
+import multiprocessing
 import os
+import queue
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-model_path = os.path.abspath("models/mistral-7b-instruct-v0.1.Q4_K_M.gguf")
+from src.cache import CACHE_DIR
+from src.dedup import NearDuplicateIndex
+from src.metrics import get_metrics
+from src.model_registry import choose, configure, invoke, max_concurrency
 
-llm = LlamaCpp(
-    model_path=model_path,
-    n_ctx=2048,
-    temperature=0.1,
-    max_tokens=128,
-    top_p=0.9,
-    n_gpu_layers=0,
-    verbose=False
-)
+LABELS = ["Functional", "Non-Functional", "Ambiguous"]
+VAGUE_TERMS = ["should", "could", "may", "might", "as soon as possible", "etc", "user-friendly"]
 
 # 🔖 Basic requirement classification
-def classify_with_llm(requirement: str) -> str:
-    prompt = f"""
+# Fixed instruction preambles come first so their evaluated state can be reused
+# across requirements (see model_registry.invoke(prefix=...)).
+CLASSIFY_PREFIX = """
 You are a Requirements Classification Assistant.
 Classify the following requirement as one of:
 - Functional
 - Non-Functional
 - Ambiguous
 
-Requirement: "{requirement}"
+Requirement: \""""
+
+def classify_with_confidence(requirement: str, use_cascade: bool = True):
+    """
+    (label, probability) — decoding is constrained to LABELS, so no parsing is needed.
+    With use_cascade, a confident local classifier answers without any LLM call.
+    """
+    guess = cascade_predict(requirement) if use_cascade else None
+    if guess is not None:
+        return guess
+    prompt = CLASSIFY_PREFIX + f"""{requirement}"
 
 Only respond with one label.
 """
-    return llm.invoke(prompt).strip()
+    return choose(prompt, LABELS, prefix=CLASSIFY_PREFIX)
+
+def classify_with_llm(requirement: str, use_cascade: bool = True) -> str:
+    return classify_with_confidence(requirement, use_cascade)[0]
 
 # 💬 Explanation of the classification
-def explain_classification(requirement: str) -> str:
-    prompt = f"""
+EXPLAIN_PREFIX = """
 You are a requirements expert.
 
 Explain why the following requirement is categorized the way it is.
 Include keywords, clarity, and purpose in your reasoning.
 
-Requirement: "{requirement}"
+Requirement: \""""
+
+def explain_classification(requirement: str) -> str:
+    prompt = EXPLAIN_PREFIX + f"""{requirement}"
 
 Explanation:
 """
-    return llm.invoke(prompt).strip()
+    return invoke(prompt, max_tokens=128, prefix=EXPLAIN_PREFIX).strip()
 
 # 🤖 Ambiguity detection (simple + LLM-enhanced)
-def score_ambiguity(requirement: str) -> dict:
-    # Simple keyword-based heuristics
-    vague_terms = ["should", "could", "may", "might", "as soon as possible", "etc", "user-friendly"]
-    score = 0
-    found = []
-
-    for term in vague_terms:
-        if term.lower() in requirement.lower():
-            score += 1
-            found.append(term)
+def keyword_ambiguity(requirement: str) -> dict:
+    """Simple keyword-based heuristics (no LLM call)"""
+    found = [term for term in VAGUE_TERMS if term.lower() in requirement.lower()]
+    return {"vague_terms": found, "keyword_score": len(found)}
 
-    # Optional: Add LLM scoring (you can disable if slow)
-    prompt = f"""
+AMBIGUITY_PREFIX = """
 Rate how ambiguous this requirement is on a scale of 0 to 10.
 Ambiguous means unclear, open to interpretation, or vague.
 
-Requirement: "{requirement}"
+Requirement: \""""
+AMBIGUITY_SCORES = [str(score) for score in range(11)]
+
+def score_ambiguity(requirement: str) -> dict:
+    heuristics = keyword_ambiguity(requirement)
+
+    # Optional: Add LLM scoring (you can disable if slow)
+    prompt = AMBIGUITY_PREFIX + f"""{requirement}"
 
 Just give the number.
 """
     try:
-        llm_score = llm.invoke(prompt).strip()
-        llm_score = int(''.join(filter(str.isdigit, llm_score))[:2])  # clean numeric output
-    except:
+        llm_score = int(choose(prompt, AMBIGUITY_SCORES, prefix=AMBIGUITY_PREFIX)[0])
+    except Exception:
         llm_score = None
 
     return {
-        "vague_terms": found,
-        "keyword_score": score,
+        **heuristics,
         "llm_score": llm_score
     }
+
+# 🧩 Fused analysis — label, explanation and ambiguity from a single prompt
+def normalize_label(text: str) -> str:
+    """Map free-form model output onto one of LABELS (defaults to Ambiguous)"""
+    lowered = text.lower()
+    if "non-functional" in lowered or "non functional" in lowered or "nonfunctional" in lowered:
+        return "Non-Functional"
+    if "functional" in lowered:
+        return "Functional"
+    return "Ambiguous"
+
+def parse_analysis(response: str) -> dict:
+    """
+    Robustly parse the JSON answer of analyze_requirement.
+    Falls back to field-by-field regex extraction when the JSON is malformed or truncated.
+    """
+    data = {}
+    match = re.search(r"\{.*\}", response, re.DOTALL)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            data = {}
+
+    if not isinstance(data, dict) or not data:
+        data = {}
+        for field in ("label", "explanation"):
+            m = re.search(rf'"?{field}"?\s*:\s*"((?:[^"\\]|\\.)*)', response, re.IGNORECASE)
+            if m:
+                data[field] = m.group(1).replace('\\"', '"')
+        m = re.search(r'"?ambiguity"?\s*:\s*"?(\d+)', response, re.IGNORECASE)
+        if m:
+            data["ambiguity"] = m.group(1)
+
+    try:
+        llm_score = max(0, min(10, int(str(data.get("ambiguity", "")).strip())))
+    except ValueError:
+        llm_score = None
+
+    return {
+        "label": normalize_label(str(data.get("label", response))),
+        "explanation": str(data.get("explanation", "")).strip(),
+        "llm_score": llm_score
+    }
+
+ANALYSIS_PREFIX = """
+You are a requirements engineering expert.
+Analyze the following requirement and answer with a single JSON object:
+{"label": "Functional" | "Non-Functional" | "Ambiguous",
+ "explanation": "<why it has this label: keywords, clarity, purpose>",
+ "ambiguity": <integer 0-10, how unclear or open to interpretation it is>}
+
+Requirement: \""""
+
+# Same analysis when the cascade has already labelled the requirement: the model only
+# explains that label and rates ambiguity
+DESCRIBE_PREFIX = """
+You are a requirements engineering expert.
+The following requirement has already been classified. Answer with a single JSON object:
+{"explanation": "<why it has this label: keywords, clarity, purpose>",
+ "ambiguity": <integer 0-10, how unclear or open to interpretation it is>}
+
+Requirement: \""""
+
+def analyze_requirement(requirement: str, use_cascade: bool = True) -> dict:
+    """
+    One LLM call per requirement instead of four: returns classification label,
+    explanation and ambiguity score (plus keyword heuristics) in one dict.
+    With use_cascade, a confident local classifier supplies the label and the LLM is
+    only asked for the explanation and ambiguity score; "label_source" records which
+    path produced the label.
+    """
+    guess = cascade_predict(requirement) if use_cascade else None
+    if guess is not None:
+        label, confidence = guess
+        prefix = DESCRIBE_PREFIX
+        prompt = DESCRIBE_PREFIX + f"""{requirement}"
+Label: {label}
+
+JSON:
+"""
+    else:
+        prefix = ANALYSIS_PREFIX
+        prompt = ANALYSIS_PREFIX + f"""{requirement}"
+
+JSON:
+"""
+    try:
+        result = parse_analysis(invoke(prompt, max_tokens=256, prefix=prefix))
+    except Exception:
+        result = {"label": "Ambiguous", "explanation": "⚠️ No analysis returned.", "llm_score": None}
+    if guess is not None:
+        result = {**result, "label": label, "label_source": "cascade", "confidence": confidence}
+    else:
+        result = {**result, "label_source": "llm"}
+    return {"requirement": requirement, **result, **keyword_ambiguity(requirement)}
+
+
+# 🪜 Confidence-gated cascade — a local classifier trained on earlier LLM labels
+# answers the easy requirements; only uncertain ones go to the LLM
+CASCADE_MODEL_PATH = os.path.join(CACHE_DIR, "label_model.joblib")
+CASCADE_THRESHOLD = float(os.environ.get("REQAI_CASCADE_THRESHOLD", "0.9"))
+
+_label_model = None
+_label_model_stamp = None
+
+def load_label_model(path=None):
+    """Trained local classifier, reloaded when the file changes (None if not trained)"""
+    global _label_model, _label_model_stamp
+    if os.environ.get("REQAI_DISABLE_CASCADE"):
+        return None
+    path = path or CASCADE_MODEL_PATH
+    try:
+        stamp = (path, os.path.getmtime(path))
+    except OSError:
+        return None
+    if stamp != _label_model_stamp:
+        try:
+            import joblib
+            _label_model = joblib.load(path)
+            _label_model_stamp = stamp
+        except Exception as e:
+            print(f"⚠️ Could not load cascade model: {e}")
+            return None
+    return _label_model
+
+def cascade_predict(requirement: str, threshold: float = None):
+    """(label, confidence) from the local classifier, or None if it is untrained or unsure"""
+    model = load_label_model()
+    if model is None:
+        return None
+    proba = model.predict_proba([requirement])[0]
+    best = proba.argmax()
+    if proba[best] < (CASCADE_THRESHOLD if threshold is None else threshold):
+        return None
+    return str(model.classes_[best]), float(proba[best])
+
+def calibration_report(proba, classes, truth, thresholds=(0.5, 0.6, 0.7, 0.8, 0.9, 0.95), bins=10) -> dict:
+    """Held-out accuracy, expected calibration error and coverage/accuracy per confidence threshold"""
+    import numpy as np
+
+    confidence = proba.max(axis=1)
+    correct = np.asarray(classes)[proba.argmax(axis=1)] == np.asarray(truth)
+
+    ece = 0.0
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > low) & (confidence <= high)
+        if in_bin.any():
+            ece += in_bin.mean() * abs(correct[in_bin].mean() - confidence[in_bin].mean())
+
+    by_threshold = []
+    for t in thresholds:
+        kept = confidence >= t
+        by_threshold.append({
+            "threshold": t,
+            "cascade_share": float(kept.mean()),
+            "accuracy_on_cascade": float(correct[kept].mean()) if kept.any() else None
+        })
+    return {
+        "holdout_size": int(len(truth)),
+        "accuracy": float(correct.mean()),
+        "expected_calibration_error": float(ece),
+        "thresholds": by_threshold
+    }
+
+def train_label_model(examples, path=CASCADE_MODEL_PATH, min_examples=50, test_size=0.2, seed=0) -> dict:
+    """
+    Fit TF-IDF + logistic regression on (text, label) pairs labelled by the LLM and save it.
+    Returns a calibration report measured on a held-out split before refitting on all data.
+    """
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import make_pipeline
+
+    examples = [(text, label) for text, label in examples if label in LABELS]
+    labels = [label for _, label in examples]
+    if len(examples) < min_examples or len(set(labels)) < 2:
+        raise ValueError(
+            f"❌ Need at least {min_examples} LLM-labelled requirements covering 2+ labels "
+            f"(have {len(examples)})."
+        )
+    texts = [text for text, _ in examples]
+
+    def make_model():
+        return make_pipeline(
+            TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+            LogisticRegression(max_iter=1000, class_weight="balanced")
+        )
+
+    counts = Counter(labels)
+    stratify = labels if min(counts.values()) >= 2 else None
+    train_x, test_x, train_y, test_y = train_test_split(
+        texts, labels, test_size=test_size, random_state=seed, stratify=stratify
+    )
+    holdout_model = make_model().fit(train_x, train_y)
+    report = calibration_report(holdout_model.predict_proba(test_x), holdout_model.classes_, test_y)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    joblib.dump(make_model().fit(texts, labels), tmp_path)
+    os.replace(tmp_path, path)
+
+    report.update({"examples": len(texts), "label_counts": dict(counts), "model_path": path})
+    return report
+
+def cascade_label_share(analyses) -> float:
+    """
+    Share of analyses whose label came from the cascade instead of the LLM. In
+    analyze_requirement the LLM still writes their explanation and ambiguity score,
+    so this is the share of labels decided locally, not of LLM calls saved.
+    """
+    analyses = list(analyses)
+    if not analyses:
+        return 0.0
+    return sum(a.get("label_source") == "cascade" for a in analyses) / len(analyses)
+
+
+# 🚀 Batch analysis — spread requirements over worker processes
+def default_workers() -> int:
+    """
+    One worker per 8 cores (each llama.cpp worker saturates ~8 threads well), or as
+    many as the inference server takes at once when the backend is a server.
+    """
+    if "REQAI_WORKERS" in os.environ:
+        return int(os.environ["REQAI_WORKERS"])
+    concurrency = max_concurrency()
+    return concurrency if concurrency > 1 else max(1, (os.cpu_count() or 1) // 8)
+
+def _init_worker(n_threads: int):
+    configure(n_threads=n_threads)
+
+def _analyze_task(requirement: str):
+    """analyze_requirement in a pool process, returning its timings for the parent to merge"""
+    return analyze_requirement(requirement), get_metrics().drain()
+
+def _analyze_in_thread(requirement: str):
+    # Threads already record into the parent's metrics
+    return analyze_requirement(requirement), {}
+
+def _near_duplicate_index(dedup):
+    if isinstance(dedup, NearDuplicateIndex):
+        return dedup
+    if dedup is None:
+        dedup = not os.environ.get("REQAI_DISABLE_DEDUP")
+    return NearDuplicateIndex() if dedup else None
+
+def analyze_requirements_batch(requirements, workers=None, progress_callback=None, result_callback=None,
+                               dedup=None) -> list:
+    """
+    Analyze many requirements at once and return results in input order.
+    requirements may be a lazy iterable (e.g. extractor.iter_requirements): work is
+    scheduled as items arrive, so analysis overlaps with document parsing.
+    Each worker process holds its own model (the GGUF is mmap'd, so pages are shared)
+    with n_threads tuned so workers together use every core. With a concurrent backend
+    (an inference server) workers are threads that keep that many requests in flight.
+    Near-duplicate requirements (see src/dedup.py) are analyzed once: the others get the
+    representative's answer with their own keyword heuristics and a "duplicate_of" field.
+    dedup=False turns this off (as does REQAI_DISABLE_DEDUP); passing a NearDuplicateIndex
+    shares clusters and results across calls.
+    progress_callback(done, total) is called after each finished requirement;
+    total is the number of requirements seen so far when the input length is unknown.
+    result_callback(requirement, analysis) is called as each distinct result arrives.
+    """
+    known_total = len(requirements) if hasattr(requirements, "__len__") else None
+    threaded = max_concurrency() > 1
+    workers = workers or default_workers()
+    workers = max(1, min(workers, known_total or (workers if threaded else os.cpu_count() or 1)))
+
+    index = _near_duplicate_index(dedup)
+    results = index.results if index is not None else {}   # representative text -> analysis
+    rep_of = {}
+    similarity = {}
+    announced = set()
+    seen = []
+    done = 0
+
+    def representative(req):
+        # Identical texts map to the same representative without touching the index
+        if req not in rep_of:
+            if index is None:
+                rep_of[req] = req
+            else:
+                rep_of[req] = index.texts[index.add(req)]
+                similarity[req] = index.similarity[-1]
+        return rep_of[req]
+
+    def analysis_for(req):
+        rep = rep_of[req]
+        if rep == req:
+            return results[rep]
+        return {
+            **results[rep],
+            "requirement": req,
+            "duplicate_of": rep,
+            "duplicate_similarity": round(similarity[req], 3),
+            **keyword_ambiguity(req)
+        }
+
+    def announce(req):
+        if result_callback and req not in announced:
+            announced.add(req)
+            result_callback(req, analysis_for(req))
+
+    def report(n=1):
+        nonlocal done
+        done += n
+        if progress_callback:
+            progress_callback(done, known_total or len(seen))
+
+    if workers == 1:
+        for req in requirements:
+            seen.append(req)
+            rep = representative(req)
+            if rep not in results:
+                results[rep] = analyze_requirement(rep)
+            announce(req)
+            report()
+        return [analysis_for(req) for req in seen]
+
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    finished = queue.SimpleQueue()
+    waiting = Counter()     # representative -> how many inputs wait for its running job
+    members = {}            # representative -> distinct texts waiting for it (ordered)
+
+    def drain(block=False):
+        while waiting:
+            try:
+                rep, future = finished.get(block=block)
+            except queue.Empty:
+                return
+            results[rep], stages = future.result()
+            get_metrics().merge(stages)
+            for req in members.pop(rep):
+                announce(req)
+            report(waiting.pop(rep))
+            block = False
+
+    if threaded:
+        executor, task = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reqai-analyze"), _analyze_in_thread
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(n_threads,),
+        )
+        task = _analyze_task
+
+    with executor as pool:
+        for req in requirements:
+            seen.append(req)
+            rep = representative(req)
+            if rep in results:
+                announce(req)
+                report()
+            elif rep in waiting:
+                waiting[rep] += 1
+                members[rep][req] = None
+            else:
+                waiting[rep] = 1
+                members[rep] = {req: None}
+                future = pool.submit(task, rep)
+                future.add_done_callback(lambda f, r=rep: finished.put((r, f)))
+            drain()
+        while waiting:
+            drain(block=True)
+
+    return [analysis_for(req) for req in seen]
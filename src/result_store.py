@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from src.cache import CACHE_DIR
+from src.extractor import ID_SCHEMES
+
+STORE_PATH = os.path.join(CACHE_DIR, "results.sqlite")
+
+# Leading ID of any scheme the segmenter knows (REQ-001:, SR-12, Article 5(2), 3.1.2 ...)
+REQ_ID_PREFIX = re.compile(r'^\s*(' + "|".join(ID_SCHEMES.values()) + r')(?:\s*:|\s|$)')
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace-insensitive form of a requirement used for change detection"""
+    return " ".join(text.split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _next_key(text, seen):
+    match = REQ_ID_PREFIX.match(text)
+    key = match.group(1) if match else f"#{text_hash(text)[:16]}"
+    seen[key] = seen.get(key, 0) + 1
+    return key if seen[key] == 1 else f"{key}#{seen[key]}"
+
+
+def requirement_keys(requirements):
+    """
+    Stable key per requirement: its ID (REQ-XXX, SR-XXX, Article 5(2) ...), or the text
+    hash when it has none.
+    Repeated keys within one document get a #n suffix so every row stays addressable.
+    """
+    seen = {}
+    return [_next_key(text, seen) for text in requirements]
+
+
+class ResultStore:
+    """
+    Persistent per-requirement analysis results, one row per (document, requirement key).
+    Re-analysing a revised document only sends added or modified requirements to the LLM.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS requirements (
+                   document TEXT NOT NULL,
+                   req_key TEXT NOT NULL,
+                   position INTEGER NOT NULL,
+                   text_hash TEXT NOT NULL,
+                   text TEXT NOT NULL,
+                   analysis TEXT NOT NULL,
+                   updated REAL NOT NULL,
+                   PRIMARY KEY (document, req_key)
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_req_hash ON requirements(text_hash)")
+        self._conn.commit()
+
+    def stored(self, document):
+        """{req_key: (text_hash, analysis)} for the last stored revision of a document"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT req_key, text_hash, analysis FROM requirements WHERE document = ?", (document,)
+            ).fetchall()
+        return {key: (h, json.loads(a)) for key, h, a in rows}
+
+    def _analysis_by_hash(self, digest):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis FROM requirements WHERE text_hash = ? LIMIT 1", (digest,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def labelled_examples(self):
+        """(text, label) pairs labelled by the LLM itself — training data for the nlp cascade"""
+        with self._lock:
+            rows = self._conn.execute("SELECT text_hash, text, analysis FROM requirements").fetchall()
+        examples, seen = [], set()
+        for digest, text, analysis in rows:
+            analysis = json.loads(analysis)
+            # Cascade outputs and labels copied from a near-duplicate are never fed back into training
+            if (digest in seen or analysis.get("label_source") == "cascade" or analysis.get("duplicate_of")
+                    or not analysis.get("label")):
+                continue
+            seen.add(digest)
+            examples.append((text, analysis["label"]))
+        return examples
+
+    def diff(self, document, requirements) -> dict:
+        """Compare a new revision with the stored one: added / modified / unchanged / removed keys"""
+        requirements = list(requirements)
+        old = self.stored(document)
+        changes = {"added": [], "modified": [], "unchanged": [], "removed": []}
+        keys = requirement_keys(requirements)
+        for key, text in zip(keys, requirements):
+            if key not in old:
+                changes["added"].append(key)
+            elif old[key][0] != text_hash(text):
+                changes["modified"].append(key)
+            else:
+                changes["unchanged"].append(key)
+        changes["removed"] = sorted(set(old) - set(keys))
+        return changes
+
+    def save(self, document, requirements, analyses):
+        """Replace the stored revision of a document"""
+        now = time.time()
+        rows = [
+            (document, key, i, text_hash(text), text, json.dumps(analysis), now)
+            for i, (key, text, analysis) in enumerate(zip(requirement_keys(requirements), requirements, analyses))
+        ]
+        with self._lock:
+            self._conn.execute("DELETE FROM requirements WHERE document = ?", (document,))
+            self._conn.executemany(
+                "INSERT INTO requirements (document, req_key, position, text_hash, text, analysis, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def analyze_revision(self, document, requirements, analyze_batch=None, progress_callback=None,
+                         result_callback=None):
+        """
+        Analyze a (possibly revised) document, running the LLM only on requirements whose
+        normalized text is not stored yet. requirements may be a lazy iterable.
+        result_callback(requirement, analysis) sees reused and fresh results as they arrive.
+        Returns (requirements, analyses, changes) with changes as produced by diff().
+        """
+        if analyze_batch is None:
+            from src.nlp import analyze_requirements_batch as analyze_batch
+
+        old = self.stored(document)
+        texts, reused, seen = [], [], {}
+
+        def needs_llm():
+            for text in requirements:
+                texts.append(text)
+                digest = text_hash(text)
+                key = _next_key(text, seen)
+                if key in old and old[key][0] == digest:
+                    reused.append(old[key][1])
+                else:
+                    # Same text stored under another ID or document: reuse it as well
+                    reused.append(self._analysis_by_hash(digest))
+                if reused[-1] is None:
+                    yield text
+                elif result_callback:
+                    result_callback(text, {**reused[-1], "requirement": text})
+
+        kwargs = {"result_callback": result_callback} if result_callback else {}
+        fresh = iter(analyze_batch(needs_llm(), progress_callback=progress_callback, **kwargs))
+        analyses = [a if a is not None else next(fresh) for a in reused]
+        # Stored analyses were made for the old text; refresh the fields tied to this revision
+        analyses = [{**a, "requirement": t} for a, t in zip(analyses, texts)]
+
+        changes = self.diff(document, texts)
+        self.save(document, texts, analyses)
+        return texts, analyses, changes
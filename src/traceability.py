@@ -1,24 +1,13 @@
 
 import pandas as pd
 from difflib import SequenceMatcher
-from langchain_community.llms import LlamaCpp
-import os
 import streamlit as st
-from pyvis.network import Network
 import streamlit.components.v1 as components
-import tempfile
-
-# Load local model
-model_path = os.path.abspath("models/mistral-7b-instruct-v0.1.Q4_K_M.gguf")
-llm = LlamaCpp(
-    model_path=model_path,
-    n_ctx=2048,
-    temperature=0.1,
-    max_tokens=64,
-    top_p=0.9,
-    n_gpu_layers=0,
-    verbose=False
-)
+from collections import Counter
+import time
+
+from src.metrics import record, stage
+from src.model_registry import choose, invoke, map_concurrent
 
 def simulate_traceability_data():
     stakeholder_reqs = pd.DataFrame({
@@ -55,7 +44,41 @@ def simulate_traceability_data():
 def compute_similarity(a, b):
     return SequenceMatcher(None, a.lower(), b.lower()).ratio()
 
-def build_trace_links(sr_df, sysr_df, tc_df, threshold=0.3):
+# Below this many SR × candidate pairs the exact difflib ratio is cheap enough
+SMALL_INPUT_PAIRS = 5000
+
+# Default link threshold per method: the two scores live on different scales
+# (unrelated sentences already reach ~0.3 with difflib). The tfidf value gives about
+# as many links as difflib at 0.3 on data/Extended_*, mostly the same ones.
+DEFAULT_THRESHOLDS = {"difflib": 0.3, "tfidf": 0.04}
+
+def tfidf_similarity(queries, candidates, analyzer="char_wb", ngram_range=(3, 5)):
+    """
+    Cosine similarity of every query against every candidate as one sparse matrix
+    (rows = queries, columns = candidates). Vectors are L2-normalised TF-IDF over
+    character n-grams, so a single sparse product gives all pairwise scores.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    queries = [str(q) for q in queries]
+    candidates = [str(c) for c in candidates]
+    vectorizer = TfidfVectorizer(analyzer=analyzer, ngram_range=ngram_range, sublinear_tf=True)
+    vectorizer.fit(queries + candidates)
+    return (vectorizer.transform(queries) @ vectorizer.transform(candidates).T).tocsr()
+
+def select_links(similarity, row, threshold=0.3, top_k=None):
+    """Candidate column indices for one query row: score >= threshold, best top_k, in input order"""
+    start, end = similarity.indptr[row], similarity.indptr[row + 1]
+    cols = similarity.indices[start:end]
+    scores = similarity.data[start:end]
+    keep = scores >= threshold
+    cols, scores = cols[keep], scores[keep]
+    if top_k is not None and len(cols) > top_k:
+        best = scores.argsort()[::-1][:top_k]
+        cols = cols[best]
+    return sorted(cols.tolist())
+
+def _build_trace_links_pairwise(sr_df, sysr_df, tc_df, threshold=0.3):
     trace_links = []
     for _, sr in sr_df.iterrows():
         sr_id = sr.iloc[0]
@@ -74,8 +97,49 @@ def build_trace_links(sr_df, sysr_df, tc_df, threshold=0.3):
         })
     return pd.DataFrame(trace_links)
 
-def llm_predict_link(req_text, candidate_text, level="system") -> bool:
-    prompt = f"""
+def _build_trace_links_tfidf(sr_df, sysr_df, tc_df, threshold=0.3, top_k=None):
+    sr_ids, sr_texts = sr_df.iloc[:, 0].tolist(), sr_df.iloc[:, 1].tolist()
+    sysr_ids, tc_ids = sysr_df.iloc[:, 0].tolist(), tc_df.iloc[:, 0].tolist()
+    sysr_sim = tfidf_similarity(sr_texts, sysr_df.iloc[:, 1].tolist())
+    tc_sim = tfidf_similarity(sr_texts, tc_df.iloc[:, 1].tolist())
+
+    trace_links = []
+    for row, sr_id in enumerate(sr_ids):
+        linked_sysrs = [sysr_ids[i] for i in select_links(sysr_sim, row, threshold, top_k)]
+        linked_tcs = [tc_ids[i] for i in select_links(tc_sim, row, threshold, top_k)]
+        trace_links.append({
+            "Stakeholder Requirement": sr_id,
+            "System Requirements": ", ".join(map(str, linked_sysrs)),
+            "Test Cases": ", ".join(map(str, linked_tcs))
+        })
+    return pd.DataFrame(trace_links)
+
+def build_trace_links(sr_df, sysr_df, tc_df, threshold=None, method="auto", top_k=None):
+    """
+    Similarity-based trace links.
+    method: "difflib" (exact pairwise SequenceMatcher), "tfidf" (vectorized sparse
+    cosine) or "auto" (difflib for small inputs, tfidf otherwise).
+    threshold defaults to DEFAULT_THRESHOLDS of the method actually used.
+    top_k limits the number of links per stakeholder requirement (tfidf only).
+    """
+    if method == "auto":
+        pairs = len(sr_df) * (len(sysr_df) + len(tc_df))
+        method = "difflib" if pairs <= SMALL_INPUT_PAIRS and top_k is None else "tfidf"
+
+    with stage(f"trace.{method}", pairs=len(sr_df) * (len(sysr_df) + len(tc_df))):
+        if method == "tfidf":
+            try:
+                return _build_trace_links_tfidf(sr_df, sysr_df, tc_df,
+                                                DEFAULT_THRESHOLDS["tfidf"] if threshold is None else threshold, top_k)
+            except ImportError:
+                print("⚠️ scikit-learn not installed — falling back to pairwise similarity.")
+        return _build_trace_links_pairwise(sr_df, sysr_df, tc_df,
+                                           DEFAULT_THRESHOLDS["difflib"] if threshold is None else threshold)
+
+def _link_prompt_prefix(req_text, level="system"):
+    # Everything up to the candidate text is identical for all candidates of one
+    # stakeholder requirement, so its evaluated state is shared (see invoke(prefix=...))
+    return f"""
 You are an expert systems engineer helping to trace requirements.
 
 Determine if the following {'system requirement' if level=='system' else 'test case'} is related to the stakeholder requirement.
@@ -84,78 +148,397 @@ Stakeholder Requirement:
 "{req_text}"
 
 Candidate {'System Requirement' if level=='system' else 'Test Case'}:
-"{candidate_text}"
+\""""
+
+def llm_predict_link(req_text, candidate_text, level="system") -> bool:
+    prefix = _link_prompt_prefix(req_text, level)
+    prompt = prefix + f"""{candidate_text}"
 
 Answer YES or NO only.
 """
-    response = llm.invoke(prompt).strip().lower()
-    return "yes" in response
+    answer, _ = choose(prompt, ["YES", "NO"], prefix=prefix)
+    return answer == "YES"
 
 def explain_link(sr_text, candidate_text):
-    prompt = f"""
+    prefix = f"""
 Explain briefly why the following candidate is related to the stakeholder requirement.
 
 Stakeholder Requirement:
 "{sr_text}"
 
 Candidate:
-"{candidate_text}"
+\""""
+    prompt = prefix + f"""{candidate_text}"
 
 Explanation (1-2 sentences):
 """
     try:
-        return llm.invoke(prompt).strip()
+        return invoke(prompt, max_tokens=64, prefix=prefix).strip()
     except:
         return "⚠️ No explanation returned."
 
-def build_trace_links_llm(sr_df, sysr_df, tc_df):
+def retrieve_candidates(sr_texts, candidate_texts, top_k=None):
+    """
+    Cheap first stage for LLM linking: per stakeholder requirement, the indices of
+    the top_k most lexically similar candidates (input order). top_k=None keeps all.
+    """
+    if top_k is None or top_k >= len(candidate_texts):
+        return [list(range(len(candidate_texts))) for _ in sr_texts]
+    try:
+        similarity = tfidf_similarity(sr_texts, candidate_texts)
+        return [select_links(similarity, row, threshold=0.0, top_k=top_k) for row in range(len(sr_texts))]
+    except ImportError:
+        ranked = []
+        for sr_text in sr_texts:
+            scores = [compute_similarity(str(sr_text), str(c)) for c in candidate_texts]
+            best = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_k]
+            ranked.append(sorted(best))
+        return ranked
+
+def build_trace_links_llm(sr_df, sysr_df, tc_df, top_k=10, progress_callback=None):
+    """
+    Two-stage LLM linking: a TF-IDF retriever keeps the top_k system requirements and
+    top_k test cases per stakeholder requirement, and only those are sent to
+    llm_predict_link. top_k=None asks the model about every pair (full recall, N·(M+T) calls).
+    Call statistics are stored in the returned DataFrame's attrs["llm_stats"].
+    progress_callback(done, total, text) replaces the Streamlit progress bar (e.g. in background jobs).
+    """
+    sr_ids, sr_texts = sr_df.iloc[:, 0].tolist(), sr_df.iloc[:, 1].tolist()
+    sysr_ids, sysr_texts = sysr_df.iloc[:, 0].tolist(), sysr_df.iloc[:, 1].tolist()
+    tc_ids, tc_texts = tc_df.iloc[:, 0].tolist(), tc_df.iloc[:, 1].tolist()
+
+    with stage("trace.retrieve"):
+        sysr_candidates = retrieve_candidates(sr_texts, sysr_texts, top_k)
+        tc_candidates = retrieve_candidates(sr_texts, tc_texts, top_k)
+
     trace_links = []
-    total = len(sr_df) * (len(sysr_df) + len(tc_df))
+    total = sum(map(len, sysr_candidates)) + sum(map(len, tc_candidates))
+    all_pairs = len(sr_df) * (len(sysr_df) + len(tc_df))
     count = 0
-    progress = st.progress(0, text="🔗 Linking requirements using LLM...")
-    for _, sr in sr_df.iterrows():
-        sr_id = sr.iloc[0]
-        sr_text = sr.iloc[1]
-        linked_sysrs, linked_tcs, explanations = [], [], []
-        for _, sysr in sysr_df.iterrows():
-            if llm_predict_link(sr_text, sysr.iloc[1], level="system"):
-                linked_sysrs.append(sysr.iloc[0])
-                explanations.append(f"✔️ SYSR `{sysr.iloc[0]}` linked: {explain_link(sr_text, sysr.iloc[1])}")
-            count += 1
-            progress.progress(min(count / total, 1.0), text=f"Processing SYSRs... ({count}/{total})")
-        for _, tc in tc_df.iterrows():
-            if llm_predict_link(sr_text, tc.iloc[1], level="test"):
-                linked_tcs.append(tc.iloc[0])
-                explanations.append(f"🧪 TC `{tc.iloc[0]}` linked: {explain_link(sr_text, tc.iloc[1])}")
-            count += 1
-            progress.progress(min(count / total, 1.0), text=f"Processing TCs... ({count}/{total})")
+    explain_calls = 0
+    bar = None
+    if progress_callback is None:
+        bar = st.progress(0, text="🔗 Linking requirements using LLM...")
+        progress_callback = lambda done, total, text: bar.progress(min(done / max(total, 1), 1.0), text=text)
+    start = time.perf_counter()
+    # Every (row, level, candidate) question up front, so a concurrent backend can
+    # answer many at once; results come back in this order
+    pairs = []
+    for row in range(len(sr_ids)):
+        pairs += [(row, "system", i) for i in sysr_candidates[row]]
+        pairs += [(row, "test", i) for i in tc_candidates[row]]
+
+    def ask(pair):
+        row, level, i = pair
+        return llm_predict_link(sr_texts[row], (sysr_texts if level == "system" else tc_texts)[i], level=level)
+
+    def explain(pair):
+        row, level, i = pair
+        return explain_link(sr_texts[row], (sysr_texts if level == "system" else tc_texts)[i])
+
+    linked = []
+    for (row, level, i), is_link in zip(pairs, map_concurrent(ask, pairs)):
+        if is_link:
+            linked.append((row, level, i))
+        count += 1
+        kind = "SYSRs" if level == "system" else "TCs"
+        progress_callback(count, total, f"Processing {kind}... ({count}/{total})")
+
+    explained = map_concurrent(explain, linked)
+    per_row = {row: ([], [], []) for row in range(len(sr_ids))}
+    for (row, level, i), explanation in zip(linked, explained):
+        linked_sysrs, linked_tcs, explanations = per_row[row]
+        if level == "system":
+            linked_sysrs.append(sysr_ids[i])
+            explanations.append(f"✔️ SYSR `{sysr_ids[i]}` linked: {explanation}")
+        else:
+            linked_tcs.append(tc_ids[i])
+            explanations.append(f"🧪 TC `{tc_ids[i]}` linked: {explanation}")
+        explain_calls += 1
+
+    for row, sr_id in enumerate(sr_ids):
+        linked_sysrs, linked_tcs, explanations = per_row[row]
         trace_links.append({
             "Stakeholder Requirement": sr_id,
-            "System Requirements": ", ".join(linked_sysrs),
-            "Test Cases": ", ".join(linked_tcs),
+            "System Requirements": ", ".join(map(str, linked_sysrs)),
+            "Test Cases": ", ".join(map(str, linked_tcs)),
             "LLM Explanation": "\\n".join(explanations)
         })
-    progress.empty()
-    return pd.DataFrame(trace_links)
+    record("trace.llm_link", time.perf_counter() - start, link_calls=total, explain_calls=explain_calls)
+    if bar is not None:
+        bar.empty()
+    matrix_df = pd.DataFrame(trace_links)
+    matrix_df.attrs["llm_stats"] = {
+        "top_k": top_k,
+        "candidate_pairs": all_pairs,
+        "link_calls": total,
+        "explain_calls": explain_calls,
+        "link_calls_avoided": all_pairs - total
+    }
+    return matrix_df
+
+# 🗂️ Indexed trace model — adjacency in both directions for coverage and impact queries
+LINK_KINDS = ("sysr", "tc")
+
+def _split_ids(cell):
+    return [i.strip() for i in cell.split(",") if i.strip()] if isinstance(cell, str) else []
+
+class TraceGraph:
+    """
+    Stakeholder requirement → system requirement / test case links, indexed both ways.
+    Every node is kept in insertion order (dicts as ordered sets), and the sets of
+    unlinked nodes are maintained on each change so coverage queries are O(1).
+    """
+
+    def __init__(self, sr_ids=(), sysr_ids=(), tc_ids=()):
+        self.nodes = {"sr": {}, "sysr": {}, "tc": {}}
+        self._down = {kind: {} for kind in LINK_KINDS}        # sr → {target: None}
+        self._up = {kind: {} for kind in LINK_KINDS}          # target → {sr: None}
+        self._sr_without = {kind: {} for kind in LINK_KINDS}  # srs with no link of this kind
+        for kind, ids in (("sr", sr_ids), ("sysr", sysr_ids), ("tc", tc_ids)):
+            for node in ids:
+                self.add_node(kind, node)
+
+    @classmethod
+    def from_matrix(cls, matrix_df, sysr_ids=(), tc_ids=()):
+        """
+        Index a matrix from build_trace_links*. Pass the full system requirement and test
+        case IDs to include the ones no stakeholder requirement links to.
+        """
+        graph = cls(sysr_ids=sysr_ids, tc_ids=tc_ids)
+        for sr, sysrs, tcs in zip(
+            matrix_df["Stakeholder Requirement"], matrix_df["System Requirements"], matrix_df["Test Cases"]
+        ):
+            graph.add_node("sr", sr)
+            for target in _split_ids(sysrs):
+                graph.add_link(sr, target, "sysr")
+            for target in _split_ids(tcs):
+                graph.add_link(sr, target, "tc")
+        return graph
+
+    def add_node(self, kind, node):
+        if node in self.nodes[kind]:
+            return
+        self.nodes[kind][node] = None
+        if kind == "sr":
+            for link_kind in LINK_KINDS:
+                self._down[link_kind][node] = {}
+                self._sr_without[link_kind][node] = None
+        else:
+            self._up[kind][node] = {}
+
+    def remove_node(self, kind, node):
+        """Drop a node together with all of its links"""
+        if node not in self.nodes[kind]:
+            return
+        if kind == "sr":
+            for link_kind in LINK_KINDS:
+                for target in list(self._down[link_kind][node]):
+                    self.remove_link(node, target, link_kind)
+                del self._down[link_kind][node]
+                self._sr_without[link_kind].pop(node, None)
+        else:
+            for sr in list(self._up[kind][node]):
+                self.remove_link(sr, node, kind)
+            del self._up[kind][node]
+        del self.nodes[kind][node]
+
+    def add_link(self, sr, target, kind):
+        """Link a stakeholder requirement to a system requirement ("sysr") or test case ("tc")"""
+        self.add_node("sr", sr)
+        self.add_node(kind, target)
+        self._down[kind][sr][target] = None
+        self._up[kind][target][sr] = None
+        self._sr_without[kind].pop(sr, None)
+
+    def remove_link(self, sr, target, kind):
+        if target not in self._down[kind].get(sr, {}):
+            return
+        del self._down[kind][sr][target]
+        del self._up[kind][target][sr]
+        if not self._down[kind][sr]:
+            self._sr_without[kind][sr] = None
+
+    def links(self, sr, kind):
+        return list(self._down[kind].get(sr, ()))
+
+    def linked_requirements(self, target, kind):
+        """Stakeholder requirements linked to a system requirement or test case"""
+        return list(self._up[kind].get(target, ()))
+
+    def untested_requirements(self):
+        """Stakeholder requirements without any test case"""
+        return list(self._sr_without["tc"])
+
+    def unrealised_requirements(self):
+        """Stakeholder requirements without any system requirement"""
+        return list(self._sr_without["sysr"])
+
+    def orphans(self, kind):
+        """System requirements or test cases not linked to any stakeholder requirement"""
+        return [node for node, srs in self._up[kind].items() if not srs]
+
+    def orphan_test_cases(self):
+        return self.orphans("tc")
+
+    def impact_set(self, sysr):
+        """
+        What a change to a system requirement touches: the stakeholder requirements it
+        realises, the other system requirements realising them, and the tests to re-run.
+        """
+        srs = self.linked_requirements(sysr, "sysr")
+        siblings, tests = {}, {}
+        for sr in srs:
+            siblings.update(self._down["sysr"][sr])
+            tests.update(self._down["tc"][sr])
+        siblings.pop(sysr, None)
+        return {"stakeholder": srs, "system": list(siblings), "tests": list(tests)}
+
+    def coverage(self):
+        """Share of each node kind that is traced, in percent"""
+        n_sr = len(self.nodes["sr"])
+
+        def pct(covered, total):
+            return 100.0 * covered / total if total else 0.0
+
+        return {
+            "stakeholder_tested": pct(n_sr - len(self._sr_without["tc"]), n_sr),
+            "stakeholder_realised": pct(n_sr - len(self._sr_without["sysr"]), n_sr),
+            "system_traced": pct(len(self.nodes["sysr"]) - len(self.orphans("sysr")), len(self.nodes["sysr"])),
+            "tests_traced": pct(len(self.nodes["tc"]) - len(self.orphans("tc")), len(self.nodes["tc"])),
+        }
+
+    def to_matrix(self):
+        """The matrix DataFrame produced by build_trace_links"""
+        return pd.DataFrame(
+            [
+                {
+                    "Stakeholder Requirement": sr,
+                    "System Requirements": ", ".join(map(str, self._down["sysr"][sr])),
+                    "Test Cases": ", ".join(map(str, self._down["tc"][sr])),
+                }
+                for sr in self.nodes["sr"]
+            ],
+            columns=["Stakeholder Requirement", "System Requirements", "Test Cases"],
+        )
+
+    def to_networkx(self):
+        """Deduplicated DiGraph with a "kind" attribute per node (used for rendering)"""
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        for kind, nodes in self.nodes.items():
+            graph.add_nodes_from(nodes, kind=kind)
+        for kind in LINK_KINDS:
+            graph.add_edges_from((sr, t) for sr, targets in self._down[kind].items() for t in targets)
+        return graph
+
+# 🕸️ Graph rendering — deduplicated edges, server-side layout, HTML built in memory
+GRAPH_STYLE = {
+    "sr": ("#ffd700", "Stakeholder Requirement"),
+    "sysr": ("#90ee90", "System Requirement"),
+    "tc": ("#87cefa", "Test Case"),
+    "cluster": ("#ffa500", "Stakeholder Requirement cluster"),
+}
+GRAPH_TIERS = {"sr": 0, "cluster": 0, "sysr": 1, "tc": 2}
+CLUSTER_NODE_LIMIT = 400    # "auto" detail collapses stakeholder clusters above this many nodes
+
+def trace_graph(matrix_df):
+    """
+    Trace links as a networkx DiGraph with one edge per distinct link:
+    stakeholder requirement → system requirement and stakeholder requirement → test case.
+    """
+    return TraceGraph.from_matrix(matrix_df).to_networkx()
+
+def collapse_clusters(graph, expand=()):
+    """
+    Level-of-detail view: each stakeholder requirement not listed in expand becomes a
+    single cluster node summarising its links; expanded ones keep all their children.
+    """
+    import networkx as nx
+
+    view = nx.DiGraph()
+    expand = set(expand)
+    stakeholder = [n for n, kind in graph.nodes(data="kind") if kind == "sr"]
+    for sr in stakeholder:
+        if sr in expand:
+            view.add_node(sr, kind="sr")
+            for child in graph.successors(sr):
+                view.add_node(child, kind=graph.nodes[child]["kind"])
+                view.add_edge(sr, child)
+
+    for sr in stakeholder:
+        if sr in expand:
+            continue
+        children = list(graph.successors(sr))
+        kinds = Counter(graph.nodes[c]["kind"] for c in children)
+        view.add_node(sr, kind="cluster", members=children, sysr=kinds["sysr"], tc=kinds["tc"])
+        # Items shared with an expanded requirement stay connected to this cluster
+        view.add_edges_from((sr, child) for child in children if child in view)
+    return view
+
+def layered_layout(graph, spacing=60, tier_gap=300):
+    """
+    Positions in three rows (stakeholder / system / test), computed in linear time.
+    Linked items are ordered by the mean position of their stakeholder requirements,
+    which keeps edges short without a force simulation in the browser.
+    """
+    rows = {0: [], 1: [], 2: []}
+    for node, kind in graph.nodes(data="kind"):
+        rows[GRAPH_TIERS[kind]].append(node)
+
+    rank = {node: i for i, node in enumerate(rows[0])}
+    for tier in (1, 2):
+        rows[tier].sort(
+            key=lambda n: sum(rank.get(p, 0) for p in graph.predecessors(n)) / max(graph.in_degree(n), 1)
+        )
+
+    positions = {}
+    for tier, nodes in rows.items():
+        offset = (len(nodes) - 1) / 2
+        for i, node in enumerate(nodes):
+            positions[node] = ((i - offset) * spacing, tier * tier_gap)
+    return positions
+
+def render_traceability_html(matrix_df, detail="auto", expand=(), height="600px") -> str:
+    """
+    Self-contained HTML for the trace graph. detail is "full", "clusters" (one node per
+    stakeholder requirement, except those in expand) or "auto" (clusters for large graphs).
+    """
+    with stage("trace.graph_layout"):
+        graph = trace_graph(matrix_df)
+        if detail == "auto":
+            detail = "clusters" if graph.number_of_nodes() > CLUSTER_NODE_LIMIT else "full"
+        if detail == "clusters":
+            graph = collapse_clusters(graph, expand)
+        positions = layered_layout(graph)
+
+    from pyvis.network import Network  # pulls in IPython — only load it when a graph is drawn
+
+    net = Network(height=height, width="100%", directed=True, cdn_resources="in_line")
+    # Nodes and edges are appended directly: pyvis' add_edge scans every node per call
+    for node, data in graph.nodes(data=True):
+        color, title = GRAPH_STYLE[data["kind"]]
+        label = node
+        if data["kind"] == "cluster":
+            label = f"{node} ({data['sysr']} SYSR · {data['tc']} TC)"
+            title = f"{title}: " + ", ".join(data["members"][:20]) + (" …" if len(data["members"]) > 20 else "")
+        x, y = positions[node]
+        net.node_ids.append(node)
+        net.node_map[node] = {
+            "id": node, "label": label, "title": title, "color": color, "shape": "dot",
+            "size": 10 + 2 * min(len(data.get("members", ())), 20), "x": x, "y": y
+        }
+        net.nodes.append(net.node_map[node])
+    net.edges = [{"from": a, "to": b, "arrows": "to", "smooth": False} for a, b in graph.edges()]
+    net.toggle_physics(False)
+    with stage("trace.graph_html", nodes=graph.number_of_nodes(), edges=graph.number_of_edges()):
+        return net.generate_html()
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _cached_traceability_html(matrix_df, detail, expand):
+    return render_traceability_html(matrix_df, detail, expand)
 
-def display_traceability_graph(matrix_df):
-    net = Network(height="600px", width="100%", directed=True)
-    for _, row in matrix_df.iterrows():
-        sr = row["Stakeholder Requirement"]
-        sysrs = row["System Requirements"].split(", ")
-        tcs = row["Test Cases"].split(", ")
-        net.add_node(sr, label=sr, color="#ffd700", title="Stakeholder Requirement")
-        for sysr in sysrs:
-            if sysr.strip():
-                net.add_node(sysr, label=sysr, color="#90ee90", title="System Requirement")
-                net.add_edge(sr, sysr)
-        for tc in tcs:
-            if tc.strip():
-                net.add_node(tc, label=tc, color="#87cefa", title="Test Case")
-                for sysr in sysrs:
-                    if sysr.strip():
-                        net.add_edge(sysr, tc)
-    net.repulsion(node_distance=200, spring_length=200)
-    path = tempfile.NamedTemporaryFile(delete=False, suffix=".html").name
-    net.show(path)
-    components.html(open(path, "r", encoding="utf-8").read(), height=600, scrolling=True)
+def display_traceability_graph(matrix_df, detail="auto", expand=()):
+    html = _cached_traceability_html(matrix_df, detail, tuple(expand))
+    components.html(html, height=600, scrolling=True)
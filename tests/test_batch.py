@@ -0,0 +1,68 @@
+import json
+
+import src.nlp as nlp
+from src.batch import load_checkpoint, run_analysis
+
+
+def fake_analyze(req):
+    fake_analyze.calls.append(req)
+    return {"requirement": req, "label": "Functional", "explanation": "", "llm_score": 0,
+            "vague_terms": [], "keyword_score": 0}
+
+
+def write_spec(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "spec.txt").write_text("REQ-001: One.\nREQ-002: Two.\nREQ-003: Three.\n", encoding="utf-8")
+    (docs / "ignored.bin").write_text("REQ-009: nope", encoding="utf-8")
+    return docs
+
+
+def test_analysis_writes_one_line_per_requirement(tmp_path, monkeypatch):
+    fake_analyze.calls = []
+    monkeypatch.setattr(nlp, "analyze_requirement", fake_analyze)
+    docs = write_spec(tmp_path)
+    out = tmp_path / "out.jsonl"
+
+    assert run_analysis(str(docs), str(out), workers=1, batch_size=2) == 3
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["index"] for r in records] == [0, 1, 2]
+    assert records[0]["file"] == "spec.txt"
+    assert records[0]["label"] == "Functional"
+
+
+def test_resume_skips_done_requirements_and_drops_partial_line(tmp_path, monkeypatch):
+    fake_analyze.calls = []
+    monkeypatch.setattr(nlp, "analyze_requirement", fake_analyze)
+    docs = write_spec(tmp_path)
+    out = tmp_path / "out.jsonl"
+    run_analysis(str(docs), str(out), workers=1, batch_size=1)
+
+    # Simulate a run killed while writing the third line
+    lines = out.read_text(encoding="utf-8").splitlines(keepends=True)
+    out.write_text("".join(lines[:2]) + lines[2][:10], encoding="utf-8")
+    assert len(load_checkpoint(str(out))) == 2
+
+    fake_analyze.calls = []
+    assert run_analysis(str(docs), str(out), workers=1) == 1
+    assert fake_analyze.calls == ["REQ-003: Three."]
+    assert len(out.read_text(encoding="utf-8").splitlines()) == 3
+
+
+def test_one_batch_call_per_run_and_repeated_texts_are_written(tmp_path, monkeypatch):
+    fake_analyze.calls = []
+    monkeypatch.setattr(nlp, "analyze_requirement", fake_analyze)
+    calls = []
+    batch = nlp.analyze_requirements_batch
+    monkeypatch.setattr(nlp, "analyze_requirements_batch", lambda *a, **kw: calls.append(1) or batch(*a, **kw))
+    docs = write_spec(tmp_path)
+    (docs / "copy.txt").write_text("REQ-001: One.\n", encoding="utf-8")
+    out = tmp_path / "out.jsonl"
+
+    assert run_analysis(str(docs), str(out), workers=1, batch_size=1) == 4
+    assert calls == [1]
+    assert fake_analyze.calls == ["REQ-001: One.", "REQ-002: Two.", "REQ-003: Three."]
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert sorted((r["file"], r["index"]) for r in records) == [
+        ("copy.txt", 0), ("spec.txt", 0), ("spec.txt", 1), ("spec.txt", 2)
+    ]
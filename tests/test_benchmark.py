@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from src.benchmark import bench_segmentation, compare, scoped_environ, synthetic_requirements_text
+from src.fake_llm import FakeLLM
+
+
+def test_fake_llm_is_deterministic_and_counts_calls():
+    llm = FakeLLM()
+    assert llm.invoke("prompt") == FakeLLM().invoke("prompt")
+    assert llm.choose("prompt", ["YES", "NO"])[0] in ("YES", "NO")
+    assert llm.calls == {"invoke": 1, "choose": 1}
+
+
+def test_segmentation_benchmark_finds_generated_requirements():
+    text = synthetic_requirements_text(0.05)
+    expected = text.count("REQ-")
+    [result] = bench_segmentation((0.05,))
+    assert result["metrics"]["requirements"] >= expected
+
+
+def test_compare_flags_slowdowns_and_extra_llm_calls():
+    baseline = {"results": [
+        {"name": "segment", "case": "1MB", "seconds": 1.0, "metrics": {}},
+        {"name": "llm_analyze", "case": "n", "seconds": 0.01, "metrics": {"llm_calls": 10}},
+    ]}
+    report = {"results": [
+        {"name": "segment", "case": "1MB", "seconds": 1.5, "metrics": {}},
+        {"name": "llm_analyze", "case": "n", "seconds": 0.01, "metrics": {"llm_calls": 12}},
+    ]}
+    assert len(compare(report, baseline, tolerance=0.2)) == 2
+    assert compare(baseline, baseline) == []
+
+
+def test_scoped_environ_restores_previous_values(monkeypatch):
+    monkeypatch.setenv("REQAI_DISABLE_CACHE", "0")
+    monkeypatch.delenv("REQAI_DISABLE_CASCADE", raising=False)
+    with pytest.raises(RuntimeError):
+        with scoped_environ(REQAI_DISABLE_CACHE="1", REQAI_DISABLE_CASCADE="1"):
+            assert os.environ["REQAI_DISABLE_CACHE"] == os.environ["REQAI_DISABLE_CASCADE"] == "1"
+            raise RuntimeError
+    assert os.environ["REQAI_DISABLE_CACHE"] == "0"
+    assert "REQAI_DISABLE_CASCADE" not in os.environ
+
+
+def test_extraction_benchmark_warms_each_loader_up_untimed(tmp_path, monkeypatch):
+    import src.extractor as extractor
+    from src.benchmark import bench_extraction
+
+    for name in ("a.csv", "b.csv", "c.txt"):
+        (tmp_path / name).write_text("SR_ID,Description\nSR-001,The system shall log.\n", encoding="utf-8")
+    opened = []
+    monkeypatch.setattr(extractor, "iter_requirements", lambda path: opened.append(os.path.basename(path)) or iter([]))
+
+    results = bench_extraction(str(tmp_path))
+    assert [r["case"] for r in results] == ["a.csv", "b.csv", "c.txt"]
+    assert opened == ["a.csv", "a.csv", "b.csv", "c.txt", "c.txt"]
@@ -0,0 +1,63 @@
+import time
+
+from src.cache import DiskCache, cached_invoke, make_key
+import src.cache as cache_module
+
+
+class FakeLlm:
+    model_path = "models/fake.gguf"
+    temperature = 0.1
+    top_p = 0.9
+    max_tokens = 128
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        return f"answer to {prompt}"
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = DiskCache(str(tmp_path / "c.sqlite"))
+    assert cache.get("k") is None
+    cache.set("k", "v", namespace="m1")
+    assert cache.get("k") == "v"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_expiry(tmp_path):
+    cache = DiskCache(str(tmp_path / "c.sqlite"), ttl=0.01)
+    cache.set("k", "v")
+    time.sleep(0.05)
+    assert cache.get("k") is None
+
+
+def test_size_eviction_drops_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path / "c.sqlite"), max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_invalidate_namespace(tmp_path):
+    cache = DiskCache(str(tmp_path / "c.sqlite"))
+    cache.set("a", 1, namespace="m1")
+    cache.set("b", 2, namespace="m2")
+    assert cache.invalidate("m1") == 1
+    assert cache.get("a") is None and cache.get("b") == 2
+
+
+def test_key_depends_on_sampling_params():
+    assert make_key("p", "m", 0.1, 0.9, 128) != make_key("p", "m", 0.1, 0.9, 64)
+
+
+def test_cached_invoke_skips_second_call(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "_cache", DiskCache(str(tmp_path / "c.sqlite")))
+    llm = FakeLlm()
+    assert cached_invoke(llm, "hello") == cached_invoke(llm, "hello")
+    assert llm.calls == 1
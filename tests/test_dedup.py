@@ -0,0 +1,79 @@
+import src.nlp as nlp
+from src.dedup import (NearDuplicateIndex, build_index, duplicate_report, lsh_params, meaning_markers,
+                       near_duplicate_clusters)
+
+SPEC = [
+    "REQ-001: The system shall log all login attempts.",
+    "REQ-002: The system shall record the battery level every minute.",
+    "REQ-003: The system shall log all login attempts!",
+    "REQ-004: The system shall log all the login attempts.",
+    "REQ-005: Users may export reports as PDF.",
+]
+
+
+def test_lsh_banding_catches_pairs_at_the_threshold():
+    bands, rows = lsh_params(128, 0.8)
+    assert bands * rows <= 128
+    assert 1 - (1 - 0.8 ** rows) ** bands >= 0.98
+
+
+def test_near_duplicates_cluster_around_the_first_occurrence():
+    assert near_duplicate_clusters(SPEC) == [[0, 2, 3]]
+
+    index = NearDuplicateIndex()
+    assert [index.add(text) for text in SPEC] == [0, 1, 0, 0, 4]
+    assert index.similarity[2] == 1.0       # differs only in ID and punctuation
+    assert 0.8 <= index.similarity[3] < 1.0
+
+
+def test_duplicate_report_rows():
+    rows = duplicate_report(SPEC, sources=[f"p. {i}" for i in range(len(SPEC))])
+    assert [row["Requirement"] for row in rows] == [SPEC[0], SPEC[2], SPEC[3]]
+    assert {row["Representative"] for row in rows} == {SPEC[0]}
+    assert rows[1]["Source"] == "p. 2"
+
+
+def test_batch_analyzes_each_cluster_once(monkeypatch):
+    calls = []
+
+    def fake_analyze(req):
+        calls.append(req)
+        return {"requirement": req, "label": "Functional", **nlp.keyword_ambiguity(req)}
+
+    monkeypatch.setattr(nlp, "analyze_requirement", fake_analyze)
+    announced = []
+    texts = SPEC + ["REQ-006: The system shall log all login attempts, etc."]
+    results = nlp.analyze_requirements_batch(texts, workers=1, result_callback=lambda r, a: announced.append(r))
+
+    assert calls == [SPEC[0], SPEC[1], SPEC[4]]
+    assert [r["requirement"] for r in results] == texts
+    assert results[2]["duplicate_of"] == SPEC[0] and results[2]["label"] == "Functional"
+    assert results[5]["vague_terms"] == ["etc"]      # heuristics are the member's own
+    assert "duplicate_of" not in results[0]
+    assert announced == texts
+
+    calls.clear()
+    nlp.analyze_requirements_batch(texts, workers=1, dedup=False)
+    assert len(calls) == len(texts)
+
+
+def test_negations_modals_and_numbers_keep_requirements_apart():
+    texts = [
+        "REQ-001: The system shall encrypt all stored data with AES-256.",
+        "REQ-002: The system shall not encrypt all stored data with AES-256.",
+        "REQ-003: The page shall load within 2 seconds.",
+        "REQ-004: The page shall load within 5 seconds.",
+        "REQ-005: The page should load within 2 seconds.",
+        "REQ-006: The page shall load within 2 seconds!",
+    ]
+    index = build_index(texts)
+    assert index.representative == [0, 1, 2, 3, 4, 2]
+    assert meaning_markers(texts[1]) == {"shall", "not", "256"}
+
+
+def test_numbered_variants_do_not_share_candidate_lists():
+    texts = [f"REQ-{i}: The system shall respond to request type A within {i} seconds." for i in range(3000)]
+    index = build_index(texts)
+    assert index.representative == list(range(len(texts)))
+    # Each variant lands in buckets of its own, so add() never scans the earlier ones
+    assert max(len(members) for bucket in index._buckets for members in bucket.values()) == 1
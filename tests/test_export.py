@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from src.export import MATRIX_SHEET, export_bytes, write_csv, write_parquet, write_xlsx
+
+
+def _matrix(rows=5):
+    return pd.DataFrame({
+        "Stakeholder Requirement": [f"SR-{i:03d}" for i in range(rows)],
+        "System Requirements": ["SYSR-001, SYSR-002"] * rows,
+        "Test Cases": [None] + ["TC-001"] * (rows - 1),
+    })
+
+
+def test_xlsx_round_trip_with_illegal_characters(tmp_path):
+    df = _matrix()
+    df.loc[1, "System Requirements"] = "SYSR-\x0b001"
+    path = tmp_path / "out.xlsx"
+    write_xlsx({"Stakeholder Reqs": df.iloc[:, :1], MATRIX_SHEET: df}, path)
+    workbook = load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ["Stakeholder Reqs", MATRIX_SHEET]
+    back = pd.read_excel(path, sheet_name=MATRIX_SHEET)
+    assert len(back) == 5
+    assert back.loc[1, "System Requirements"] == "SYSR-001"
+
+
+@pytest.mark.parametrize("writer, reader", [(write_csv, pd.read_csv), (write_parquet, pd.read_parquet)])
+def test_chunked_writers_keep_every_row(tmp_path, writer, reader):
+    df = _matrix(25)
+    path = tmp_path / "out"
+    writer(df, path, chunk_rows=10)
+    back = reader(path)
+    assert back["Stakeholder Requirement"].tolist() == df["Stakeholder Requirement"].tolist()
+
+
+def test_export_bytes_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    data = export_bytes("Excel", {MATRIX_SHEET: _matrix()})
+    assert data[:2] == b"PK"
+    assert list(tmp_path.iterdir()) == []
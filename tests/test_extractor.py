@@ -1,35 +1,25 @@
-import sys
 import os
 
-# 📁 Adjust the path so we can import from /src
-current_dir = os.path.dirname(__file__)
-project_root = os.path.abspath(os.path.join(current_dir, '..'))
-src_path = os.path.join(project_root, 'src')
-sys.path.insert(0, src_path)
+import pytest
 
-sys.path.insert(0, src_path)
+import src.model_registry as registry
+from src.extractor import extract_requirements
+from src.fake_llm import FakeLLM
+from src.nlp import LABELS, classify_with_llm
 
-# 🔄 Imports from /src
-from extractor import extract_requirements
-from nlp import classify_with_llm
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 
-# 📂 Check for the file
-if os.path.exists(data_path):
-    print(f"\n🔍 Extracting from: {data_path}")
-    requirements = extract_requirements(data_path)
-    print(f"\n✅ Extracted {len(requirements)} requirements.")
 
-    # 🧠 LLM Classifications
-    print("\n🔮 Classifying with LLM (LangChain + llama-cpp-python):\n")
+@pytest.mark.parametrize("name", ["sample_requirements.docx", "CELEX_32022R1426_EN_TXT.pdf"])
+def test_extract_requirements_from_sample_documents(name):
+    requirements = extract_requirements(os.path.join(DATA_DIR, name))
+    assert requirements
+    assert all(req.strip() for req in requirements)
 
-    for i, req in enumerate(requirements[:5]):  # show first 5
-        print(f"\n🧾 Requirement {i+1}: {req}")
-        try:
-            label = classify_with_llm(req)
-            print(f"🔖 LLM Classification: {label}")
-        except Exception as e:
-            print(f"❌ Failed to classify: {e}")
 
-else:
-    print(f"\n❌ File not found at: {data_path}")
-  
\ No newline at end of file
+def test_classify_extracted_requirements_offline(monkeypatch):
+    monkeypatch.setattr(registry, "_llm", FakeLLM())
+    monkeypatch.setenv("REQAI_DISABLE_CACHE", "1")
+    requirements = extract_requirements(os.path.join(DATA_DIR, "sample_requirements.docx"))
+    for req in requirements[:5]:
+        assert classify_with_llm(req) in LABELS
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from src.jobs import JobManager
+
+
+def wait_for(job, timeout=5.0):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_jobs_are_deduplicated_by_key():
+    manager = JobManager()
+    runs = []
+
+    def work(job, value):
+        runs.append(value)
+        return value * 2
+
+    first = manager.submit("file-hash", work, 21)
+    second = manager.submit("file-hash", work, 21)
+    assert first is second
+    assert wait_for(first).result == 42
+    assert manager.submit("file-hash", work, 21).result == 42
+    assert runs == [21]
+
+
+def test_progress_and_partial_results_visible_while_running():
+    manager = JobManager()
+    release = threading.Event()
+
+    def work(job):
+        job.report(1, 3, "step one")
+        job.add_partial("first")
+        release.wait(5)
+        return "done"
+
+    job = manager.submit("k", work)
+    deadline = time.time() + 5
+    while job.snapshot()["done"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    snap = job.snapshot()
+    assert snap["status"] == "running"
+    assert (snap["done"], snap["total"], snap["partial"]) == (1, 3, ["first"])
+    release.set()
+    assert wait_for(job).status == "done"
+
+
+def test_failed_jobs_are_retried():
+    manager = JobManager()
+    attempts = []
+
+    def flaky(job):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    job = wait_for(manager.submit("k", flaky))
+    assert job.status == "failed" and "boom" in job.error
+    assert wait_for(manager.submit("k", flaky)).result == "ok"
+
+
+def test_only_finished_jobs_are_evicted():
+    manager = JobManager(max_jobs=1)
+    release = threading.Event()
+    running = manager.submit("running", lambda job: release.wait(5))
+    wait_for(manager.submit("done", lambda job: None))
+    assert manager.get("running") is running
+    release.set()
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import src.model_registry as registry
+from src.llm_server import ServerError, ServerLLM
+
+
+class StubServer:
+    """Local stand-in for llama.cpp's /v1/completions: echoes, counts and can misbehave"""
+
+    def __init__(self, delay=0.0, fail_first=0):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests.append(payload)
+                    failing = len(stub.requests) <= stub.fail_first
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(stub.delay)
+                with stub._lock:
+                    stub.in_flight -= 1
+                if failing:
+                    self._send(503, {"error": "busy"})
+                elif "grammar" in payload:
+                    self._send(200, {"choices": [{"text": "YES", "logprobs": {"token_logprobs": [-0.5]}}]})
+                else:
+                    self._send(200, {"choices": [{"text": f"echo: {payload['prompt']}"}]})
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timeout test) and closed the connection
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+def test_invoke_and_choose(stub):
+    llm = ServerLLM(stub.url, model="m.gguf", max_tokens=16)
+    try:
+        assert llm.invoke("hello") == "echo: hello"
+        assert stub.requests[0]["max_tokens"] == 16
+        assert stub.requests[0]["cache_prompt"] is True
+
+        answer, confidence = llm.choose("Linked?", ["YES", "NO"])
+        assert answer == "YES"
+        assert confidence == pytest.approx(0.6065, abs=1e-3)
+        assert stub.requests[1]["grammar"] == 'root ::= "YES" | "NO"'
+    finally:
+        llm.close()
+
+
+def test_concurrent_requests_are_bounded(stub):
+    stub.delay = 0.2
+    llm = ServerLLM(stub.url, max_concurrency=4)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            answers = list(pool.map(llm.invoke, [f"p{i}" for i in range(12)]))
+        elapsed = time.perf_counter() - start
+    finally:
+        llm.close()
+    assert answers == [f"echo: p{i}" for i in range(12)]
+    assert stub.max_in_flight == 4
+    assert elapsed < 12 * 0.2 / 2       # overlapped, not serial
+
+
+def test_retries_transient_errors(stub):
+    stub.fail_first = 2
+    llm = ServerLLM(stub.url, retries=2, backoff=0.01)
+    try:
+        assert llm.invoke("again") == "echo: again"
+        assert len(stub.requests) == 3
+    finally:
+        llm.close()
+
+
+def test_gives_up_after_retries_and_timeouts(stub):
+    stub.fail_first = 10
+    llm = ServerLLM(stub.url, retries=1, backoff=0.01)
+    try:
+        with pytest.raises(ServerError, match="503"):
+            llm.invoke("x")
+    finally:
+        llm.close()
+
+    stub.fail_first, stub.delay = 0, 0.5
+    llm = ServerLLM(stub.url, retries=0, timeout=0.1)
+    try:
+        with pytest.raises(ServerError, match="unreachable"):
+            llm.invoke("slow")
+    finally:
+        llm.close()
+
+
+def test_registry_fans_out_over_a_concurrent_backend(stub, monkeypatch):
+    monkeypatch.setenv("REQAI_DISABLE_CACHE", "1")
+    stub.delay = 0.1
+    llm = ServerLLM(stub.url, max_concurrency=3)
+    previous = registry.set_llm(llm)
+    try:
+        assert registry.max_concurrency() == 3
+        prompts = [f"q{i}" for i in range(6)]
+        assert list(registry.map_concurrent(registry.invoke, prompts)) == [f"echo: {p}" for p in prompts]
+    finally:
+        registry.set_llm(previous)
+        llm.close()
+    assert stub.max_in_flight == 3
@@ -0,0 +1,44 @@
+import src.cache as cache
+import src.model_registry as registry
+from src.fake_llm import FakeLLM
+from src.metrics import Metrics, get_metrics
+
+
+def test_stage_totals_and_derived_rates():
+    metrics = Metrics()
+    metrics.record("llm.generate", 2.0, completion_tokens=40)
+    metrics.record("llm.generate", 1.0, completion_tokens=20)
+    stage = metrics.snapshot()["llm.generate"]
+    assert stage["calls"] == 2
+    assert stage["max_seconds"] == 2.0
+    assert stage["completion_tokens_per_s"] == 20.0
+
+
+def test_merge_drained_worker_metrics():
+    worker, parent = Metrics(), Metrics()
+    with worker.stage("extract.ocr", pages=1) as counts:
+        counts["cache_hits"] = 1
+    parent.merge(worker.drain())
+    assert worker.snapshot() == {}
+    assert parent.snapshot()["extract.ocr"]["cache_hit_rate"] == 1.0
+
+
+def test_prometheus_export():
+    metrics = Metrics()
+    metrics.record("trace.tfidf", 0.5, pairs=100)
+    text = metrics.to_prometheus()
+    assert '# TYPE reqai_stage_seconds_total counter' in text
+    assert 'reqai_stage_pairs_total{stage="trace.tfidf"} 100' in text
+    assert 'reqai_stage_avg_seconds{stage="trace.tfidf"} 0.5' in text
+
+
+def test_invoke_records_cache_hits_and_tokens(monkeypatch, tmp_path):
+    monkeypatch.setattr(registry, "_llm", FakeLLM())
+    monkeypatch.setattr(cache, "_cache", cache.DiskCache(str(tmp_path / "c.sqlite")))
+    monkeypatch.delenv("REQAI_DISABLE_CACHE", raising=False)
+    get_metrics().reset()
+    registry.invoke("Explain: x")
+    registry.invoke("Explain: x")
+    snapshot = get_metrics().snapshot()
+    assert (snapshot["llm.invoke"]["cache_misses"], snapshot["llm.invoke"]["cache_hits"]) == (1, 1)
+    assert snapshot["llm.generate"]["completion_tokens"] > 0
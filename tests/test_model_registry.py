@@ -0,0 +1,156 @@
+import ctypes
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import src.model_registry as registry
+
+
+class FakeLlamaClient:
+    """Mimics the llama_cpp.Llama state API with one token per character"""
+
+    def __init__(self):
+        self.input_ids = np.zeros(512, dtype=np.intc)
+        self.n_tokens = 0
+        self.evaluated = 0
+        self.loads = 0
+
+    @property
+    def _input_ids(self):
+        return self.input_ids[: self.n_tokens]
+
+    def tokenize(self, text, add_bos=True, special=False):
+        return ([1] if add_bos else []) + list(text)
+
+    @staticmethod
+    def longest_token_prefix(a, b):
+        n = 0
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            n += 1
+        return n
+
+    def eval(self, tokens):
+        self.input_ids[self.n_tokens : self.n_tokens + len(tokens)] = tokens
+        self.n_tokens += len(tokens)
+        self.evaluated += len(tokens)
+
+    def save_state(self):
+        return SimpleNamespace(input_ids=self.input_ids.copy(), n_tokens=self.n_tokens)
+
+    def load_state(self, state):
+        self.input_ids = state.input_ids.copy()
+        self.n_tokens = state.n_tokens
+        self.loads += 1
+
+
+def test_prefix_is_evaluated_once_and_restored(monkeypatch):
+    monkeypatch.setattr(registry, "_prefix_states", registry.OrderedDict())
+    client = FakeLlamaClient()
+
+    registry._restore_prefix(client, "shared prefix ")
+    assert client.evaluated == len("shared prefix ") + 1
+
+    # Simulate a generation that overwrote the context with a different prompt
+    client.n_tokens = 0
+    client.eval([1] + list(b"other prompt"))
+    evaluated = client.evaluated
+
+    registry._restore_prefix(client, "shared prefix ")
+    assert client.loads == 1
+    assert client.evaluated == evaluated
+    assert client._input_ids.tolist() == [1] + list(b"shared prefix ")
+
+
+def test_restore_skipped_when_context_already_holds_prefix(monkeypatch):
+    monkeypatch.setattr(registry, "_prefix_states", registry.OrderedDict())
+    client = FakeLlamaClient()
+    registry._restore_prefix(client, "abc")
+    client.eval(list(b"suffix"))
+    registry._restore_prefix(client, "abc")
+    assert client.loads == 0
+
+
+def test_prefix_states_are_bounded(monkeypatch):
+    monkeypatch.setattr(registry, "_prefix_states", registry.OrderedDict())
+    monkeypatch.setattr(registry, "PREFIX_STATE_SLOTS", 2)
+    client = FakeLlamaClient()
+    for prefix in ("a", "b", "c"):
+        registry._restore_prefix(client, prefix)
+    assert list(registry._prefix_states) == ["b", "c"]
+
+
+class LlamaLikeClient(FakeLlamaClient):
+    """
+    Behaves like llama_cpp.Llama loaded with the defaults (logits_all=False, n_batch=8):
+    scores has n_batch rows and is never written, only the last token of each batch
+    gets logits (through _ctx), and logprobs are refused.
+    """
+
+    n_batch = 8
+
+    def __init__(self, preferred):
+        super().__init__()
+        self.preferred = preferred
+        self.scores = np.full((self.n_batch, 256), np.nan, dtype=np.single)
+        self._last = np.zeros(256, dtype=np.single)
+        self._ctx = SimpleNamespace(get_logits_ith=self._get_logits_ith)
+        self.completions = []
+
+    def n_vocab(self):
+        return 256
+
+    def _get_logits_ith(self, i):
+        assert i == -1
+        return self._last.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
+
+    def _logits(self):
+        row = np.zeros(256, dtype=np.single)
+        for rank, ch in enumerate(self.preferred):
+            row[ord(ch)] = 5.0 - rank
+        return row
+
+    def eval(self, tokens):
+        for i in range(0, len(tokens), self.n_batch):
+            super().eval(tokens[i:i + self.n_batch])
+            self._last = self._logits()
+
+    def create_completion(self, prompt, grammar=None, max_tokens=16, temperature=0.8, logprobs=None, **kwargs):
+        if logprobs is not None:
+            raise ValueError("logprobs is not supported for models created with logits_all=False")
+        options = json.loads("[" + grammar.split("::=", 1)[1].replace(" | ", ", ") + "]")
+        # Greedy, one character per token, restricted to what the grammar still allows
+        text, logits = "", self._logits()
+        while text not in options or any(o.startswith(text) and o != text and
+                                         logits[ord(o[len(text)])] > 0 for o in options):
+            allowed = {o[len(text)] for o in options if o.startswith(text) and len(o) > len(text)}
+            text += max(allowed, key=lambda ch: (logits[ord(ch)], ch))
+        self.completions.append(text)
+        return {"choices": [{"text": text}], "usage": {"completion_tokens": len(text)}}
+
+
+@pytest.fixture
+def gbnf(monkeypatch):
+    # llama_cpp.LlamaGrammar is not needed by the stand-in client: pass the rule text through
+    monkeypatch.setattr(registry, "_option_grammar",
+                        lambda options: "root ::= " + " | ".join(json.dumps(o) for o in options))
+
+
+def test_choose_option_works_without_logits_all(gbnf):
+    client = LlamaLikeClient("NY")
+    prompt = "Is the candidate linked to the stakeholder requirement? Answer:\n"
+    option, confidence = registry._choose_option(client, prompt, ["YES", "NO"])
+    assert option == "NO"
+    assert 0.5 < confidence < 1.0
+    assert client.completions == ["NO"]
+    assert np.isnan(client.scores).all()       # never relied on
+
+
+def test_choose_option_generates_multi_token_options(gbnf):
+    client = LlamaLikeClient("10")
+    option, confidence = registry._choose_option(client, "Score from 0 to 10:\n", [str(i) for i in range(11)])
+    assert option == "10"
+    assert confidence > 0.5
@@ -0,0 +1,119 @@
+import pytest
+
+import src.nlp as nlp
+from src.nlp import analyze_requirement, normalize_label, parse_analysis
+
+
+def test_parse_analysis_with_chatter_around_json():
+    result = parse_analysis(
+        'Sure! {"label": "Non-Functional", "explanation": "Response time.", "ambiguity": 2} Done.'
+    )
+    assert result == {"label": "Non-Functional", "explanation": "Response time.", "llm_score": 2}
+
+
+def test_parse_analysis_truncated_json_falls_back_to_fields():
+    result = parse_analysis('{"label": "Functional", "explanation": "Describes a behaviour')
+    assert result["label"] == "Functional"
+    assert result["explanation"] == "Describes a behaviour"
+    assert result["llm_score"] is None
+
+
+def test_parse_analysis_clamps_score():
+    assert parse_analysis('{"label": "Ambiguous", "ambiguity": 42}')["llm_score"] == 10
+
+
+def test_normalize_label():
+    assert normalize_label("non functional") == "Non-Functional"
+    assert normalize_label("Functional.") == "Functional"
+    assert normalize_label("I am not sure") == "Ambiguous"
+
+
+def test_analyze_requirement_uses_one_llm_call(monkeypatch):
+    calls = []
+
+    def fake_invoke(prompt, max_tokens=128, **kwargs):
+        calls.append(prompt)
+        return '{"label": "Functional", "explanation": "Uses shall.", "ambiguity": 1}'
+
+    monkeypatch.setattr(nlp, "invoke", fake_invoke)
+    monkeypatch.setenv("REQAI_DISABLE_CASCADE", "1")
+    result = analyze_requirement("The system should log errors.")
+    assert len(calls) == 1
+    assert result["label"] == "Functional"
+    assert result["vague_terms"] == ["should"]
+    assert result["keyword_score"] == 1
+
+
+def test_batch_keeps_input_order_and_dedupes(monkeypatch):
+    seen = []
+
+    def fake_analyze(req):
+        seen.append(req)
+        return {"requirement": req}
+
+    monkeypatch.setattr(nlp, "analyze_requirement", fake_analyze)
+    progress = []
+    results = nlp.analyze_requirements_batch(
+        ["b", "a", "b"], workers=1, progress_callback=lambda d, t: progress.append((d, t))
+    )
+    assert [r["requirement"] for r in results] == ["b", "a", "b"]
+    assert seen == ["b", "a"]
+    assert progress[-1] == (3, 3)
+
+
+def _labelled_examples():
+    functional = [f"The system shall export report {i} as PDF." for i in range(30)]
+    non_functional = [f"Page {i} shall load within 2 seconds under peak load." for i in range(30)]
+    return [(t, "Functional") for t in functional] + [(t, "Non-Functional") for t in non_functional]
+
+
+def test_cascade_supplies_the_label_when_confident(tmp_path, monkeypatch):
+    model_path = str(tmp_path / "label_model.joblib")
+    report = nlp.train_label_model(_labelled_examples(), path=model_path, min_examples=10)
+    assert report["examples"] == 60
+    assert 0.0 <= report["expected_calibration_error"] <= 1.0
+    assert [t["threshold"] for t in report["thresholds"]][0] == 0.5
+
+    monkeypatch.setattr(nlp, "CASCADE_MODEL_PATH", model_path)
+    prompts = []
+    answer = '{"label": "Non-Functional", "explanation": "An export feature.", "ambiguity": 2}'
+    monkeypatch.setattr(nlp, "invoke", lambda prompt, **k: prompts.append(prompt) or answer)
+    result = analyze_requirement("The system shall export report 99 as PDF.")
+    assert result["label"] == "Functional"
+    assert result["label_source"] == "cascade"
+    # Only the label is skipped: explanation and ambiguity still come from the LLM
+    assert result["explanation"] == "An export feature." and result["llm_score"] == 2
+    assert prompts[0].startswith(nlp.DESCRIBE_PREFIX) and "Label: Functional" in prompts[0]
+    assert nlp.cascade_label_share([result, {"label_source": "llm"}]) == 0.5
+
+
+def test_cascade_saves_llm_calls_only_where_it_can(tmp_path, monkeypatch):
+    from src.fake_llm import FakeLLM
+    from src.model_registry import set_llm
+
+    model_path = str(tmp_path / "label_model.joblib")
+    nlp.train_label_model(_labelled_examples(), path=model_path, min_examples=10)
+    monkeypatch.setattr(nlp, "CASCADE_MODEL_PATH", model_path)
+    monkeypatch.setenv("REQAI_DISABLE_CACHE", "1")
+    requirements = [f"The system shall export report {i} as PDF." for i in range(100, 105)]
+
+    calls = {}
+    for use_cascade in (True, False):
+        llm = FakeLLM()
+        previous = set_llm(llm)
+        try:
+            for req in requirements:
+                nlp.classify_with_llm(req, use_cascade)
+                analyze_requirement(req, use_cascade)
+        finally:
+            set_llm(previous)
+        calls[use_cascade] = dict(llm.calls)
+
+    # Classification is answered locally; the fused analysis still needs its explanation
+    assert calls[True] == {"invoke": len(requirements)}
+    assert calls[False] == {"choose": len(requirements), "invoke": len(requirements)}
+
+
+def test_train_label_model_needs_enough_examples(tmp_path):
+    with pytest.raises(ValueError):
+        nlp.train_label_model(_labelled_examples()[:5], path=str(tmp_path / "m.joblib"))
@@ -0,0 +1,75 @@
+import os
+
+import fitz
+import pytesseract
+
+import src.cache as cache_module
+import src.extractor as extractor
+from src.cache import DiskCache
+
+
+def make_mixed_pdf(path):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "REQ-001: The system shall log all errors to disk.")
+    doc.new_page()  # no text layer, like a scanned page
+    doc.new_page().insert_text((72, 72), "REQ-002: The system shall respond within 1 second.")
+    doc.save(path)
+
+
+def test_only_pages_without_text_layer_are_ocrd(tmp_path, monkeypatch):
+    pdf = str(tmp_path / "mixed.pdf")
+    make_mixed_pdf(pdf)
+    ocr_calls = []
+    monkeypatch.setattr(
+        extractor, "ocr_pdf_page", lambda source, n, dpi=300: ocr_calls.append(n) or "REQ-003: Scanned.\n"
+    )
+
+    pages = list(extractor.iter_pdf_pages_with_ocr(pdf, workers=1))
+    assert ocr_calls == [2]
+    assert [n for n, _ in pages] == [1, 2, 3]
+    assert pages[1][1] == "REQ-003: Scanned.\n"
+
+
+def test_ocr_results_are_cached_by_page_content(tmp_path, monkeypatch):
+    pdf = str(tmp_path / "mixed.pdf")
+    make_mixed_pdf(pdf)
+    monkeypatch.setattr(cache_module, "_cache", DiskCache(str(tmp_path / "c.sqlite")))
+    tesseract_calls = []
+    monkeypatch.setattr(
+        pytesseract, "image_to_string", lambda image: tesseract_calls.append(image.size) or "text"
+    )
+
+    assert extractor.ocr_pdf_page(pdf, 2, dpi=50) == "text"
+    assert extractor.ocr_pdf_page(pdf, 2, dpi=50) == "text"
+    assert len(tesseract_calls) == 1
+
+
+def test_bytes_reach_ocr_workers_as_one_temporary_file(tmp_path, monkeypatch):
+    from concurrent.futures import Future
+
+    pdf = tmp_path / "mixed.pdf"
+    make_mixed_pdf(str(pdf))
+    pools = []
+
+    class InlinePool:
+        """Runs tasks in this process, recording what the workers would receive"""
+
+        def __init__(self, max_workers, mp_context, initializer, initargs):
+            pools.append(initargs)
+            initializer(*initargs)
+
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+        def shutdown(self, cancel_futures=False):
+            pass
+
+    monkeypatch.setattr(extractor, "ProcessPoolExecutor", InlinePool)
+    monkeypatch.setattr(extractor, "ocr_pdf_page", lambda source, n, dpi=300: f"page {n} of {source}")
+
+    pages = list(extractor.iter_pdf_pages_with_ocr(pdf.read_bytes(), workers=2))
+    [(spooled,)] = pools
+    assert isinstance(spooled, str) and pages[1] == (2, f"page 2 of {spooled}")
+    assert not os.path.exists(spooled)
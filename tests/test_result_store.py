@@ -0,0 +1,58 @@
+from src.result_store import ResultStore, requirement_keys
+
+
+def fake_batch(calls):
+    def analyze_batch(requirements, progress_callback=None):
+        out = []
+        for req in requirements:
+            calls.append(req)
+            out.append({"requirement": req, "label": "Functional"})
+        return out
+    return analyze_batch
+
+
+def test_requirement_keys_use_ids_and_disambiguate():
+    keys = requirement_keys(["REQ-001: a", "REQ-001: b", "no id"])
+    assert keys[:2] == ["REQ-001", "REQ-001#2"]
+    assert keys[2].startswith("#")
+    assert requirement_keys(["SR-12 x", "Article 5(2) The", "3.1.2 The system"]) == ["SR-12", "Article 5(2)", "3.1.2"]
+
+
+def test_only_changed_requirements_reach_the_llm(tmp_path):
+    store = ResultStore(str(tmp_path / "r.sqlite"))
+    calls = []
+    rev1 = ["REQ-001: The system shall log.", "REQ-002: It shall run.", "REQ-003: Old."]
+    store.analyze_revision("spec.docx", rev1, analyze_batch=fake_batch(calls))
+    assert len(calls) == 3
+
+    calls.clear()
+    rev2 = ["REQ-001: The  system shall log.", "REQ-002: It shall run fast.", "REQ-004: New."]
+    texts, analyses, changes = store.analyze_revision("spec.docx", iter(rev2), analyze_batch=fake_batch(calls))
+    assert calls == ["REQ-002: It shall run fast.", "REQ-004: New."]
+    assert texts == rev2
+    assert [a["requirement"] for a in analyses] == rev2
+    assert changes == {
+        "added": ["REQ-004"],
+        "modified": ["REQ-002"],
+        "unchanged": ["REQ-001"],
+        "removed": ["REQ-003"],
+    }
+
+
+def test_known_text_is_reused_across_documents(tmp_path):
+    store = ResultStore(str(tmp_path / "r.sqlite"))
+    calls = []
+    store.analyze_revision("a.docx", ["Shared boilerplate."], analyze_batch=fake_batch(calls))
+    store.analyze_revision("b.docx", ["Shared boilerplate."], analyze_batch=fake_batch(calls))
+    assert calls == ["Shared boilerplate."]
+
+
+def test_labelled_examples_exclude_cascade_labels(tmp_path):
+    store = ResultStore(str(tmp_path / "r.sqlite"))
+    store.save("a.docx", ["REQ-001: x", "REQ-002: y", "REQ-003: z"], [
+        {"label": "Functional", "label_source": "llm"},
+        {"label": "Non-Functional", "label_source": "cascade"},
+        {"label": "Ambiguous"},
+    ])
+    store.save("b.docx", ["REQ-001: x"], [{"label": "Functional", "label_source": "llm"}])
+    assert sorted(store.labelled_examples()) == [("REQ-001: x", "Functional"), ("REQ-003: z", "Ambiguous")]
@@ -0,0 +1,147 @@
+from src.extractor import clean_and_split_text, segment_requirements
+
+
+def test_splits_on_requirement_ids_and_dehyphenates():
+    text = "REQ-001: The sys-\ntem shall log.\n\nREQ-002: It shall\nrun fast.\nREQ-0003:   x"
+    assert clean_and_split_text(text) == [
+        "REQ-001: The system shall log.",
+        "REQ-002: It shall run fast.",
+        "REQ-0003: x",
+    ]
+
+
+def test_paragraph_fallback():
+    assert clean_and_split_text("Para one\nline two\n\n\nPara two") == ["Para one line two", "Para two"]
+
+
+def test_requirements_spanning_pages_keep_start_page_and_span():
+    pages = [(1, "Intro text\n\nREQ-001: Starts on page one\n"), (2, "and ends on two.\nREQ-002: Second\n")]
+    reqs = list(segment_requirements(pages, source="spec.pdf"))
+    assert [r["text"] for r in reqs] == [
+        "Intro text",
+        "REQ-001: Starts on page one and ends on two.",
+        "REQ-002: Second",
+    ]
+    assert [r["page"] for r in reqs] == [1, 1, 2]
+    assert all(r["source"] == "spec.pdf" for r in reqs)
+
+
+def test_span_points_into_cleaned_text():
+    chunks = [(None, "First para\n\nREQ-001: Body here\n")]
+    cleaned = "First para \nREQ-001: Body here "
+    for req in segment_requirements(chunks):
+        start, end = req["span"]
+        assert cleaned[start:end] == req["text"]
+
+
+def test_yields_before_input_is_exhausted():
+    def pages():
+        yield 1, "REQ-001: one\nREQ-002: two\n"
+        raise AssertionError("second page should not be needed for the first requirement")
+
+    assert next(segment_requirements(pages()))["text"] == "REQ-001: one"
+
+
+def test_loader_registry_reads_bytes_and_sniffs_format(tmp_path):
+    from src.extractor import detect_format, extract_requirements, read_table
+
+    csv = b"SR_ID,Description\nSR-001,The system shall log errors.\nSR-002,It shall encrypt data.\n"
+    assert detect_format(csv) == ".csv"
+    assert detect_format(b"%PDF-1.7 ...") == ".pdf"
+    assert detect_format(b"", mime="text/plain") == ".txt"
+    assert extract_requirements(csv, "stakeholder.csv") == [
+        "SR-001 The system shall log errors.", "SR-002 It shall encrypt data."
+    ]
+    assert read_table(csv, "stakeholder.csv")["SR_ID"].tolist() == ["SR-001", "SR-002"]
+    txt = b"REQ-001: The system shall log.\nREQ-002: It shall run."
+    assert extract_requirements(txt, "spec.txt") == ["REQ-001: The system shall log.", "REQ-002: It shall run."]
+
+
+def test_detects_id_scheme_per_document():
+    from src.extractor import detect_id_scheme
+
+    text = "SYSR-001 The pump shall start.\nSYSR-002 It shall stop, see SR-001 and SYSR-001.\nTC-9: stray\n"
+    assert detect_id_scheme(text) == "SYSR"
+    # Only the detected scheme splits; mid-line references without a colon stay text
+    assert clean_and_split_text(text) == [
+        "SYSR-001 The pump shall start.",
+        "SYSR-002 It shall stop, see SR-001 and SYSR-001. TC-9: stray",
+    ]
+    assert clean_and_split_text("Article 5(2)\nThe controller shall be responsible.\nArticle 6 Lawfulness.") == [
+        "Article 5(2) The controller shall be responsible.",
+        "Article 6 Lawfulness.",
+    ]
+    assert clean_and_split_text("3.1 The system shall start in\n2.5 seconds.\n3.2 Users may log in.") == [
+        "3.1 The system shall start in 2.5 seconds.",
+        "3.2 Users may log in.",
+    ]
+
+
+def test_long_segments_are_split_within_the_budget():
+    text = "REQ-001: " + "The system shall log every event. " * 20
+    chunks = [(None, text)]
+    reqs = list(segment_requirements(chunks, max_chars=200))
+    assert len(reqs) > 1
+    assert all(len(r["text"]) <= 200 and r["text"].startswith("REQ-001: The system") for r in reqs)
+    assert " ".join(r["text"][len("REQ-001: "):] for r in reqs) == text[len("REQ-001: "):].strip()
+
+    cleaned = text.strip() + " "
+    first, second = reqs[0]["span"], reqs[1]["span"]
+    assert cleaned[first[0]:first[1]] == reqs[0]["text"]
+    assert "REQ-001: " + cleaned[second[0]:second[1]] == reqs[1]["text"]
+
+    assert len(list(segment_requirements(chunks, max_chars=0))) == 1
+
+
+def test_explicit_ids_win_over_a_table_of_contents():
+    pages = [
+        (1, "Contents\n1.1 Introduction\n1.2 Scope\n2.1 Functional Requirements\n"),
+        (2, "REQ-001: The system shall log.\nREQ-002: It shall run.\n"),
+    ]
+    reqs = list(segment_requirements(pages))
+    assert [r["text"] for r in reqs][-2:] == ["REQ-001: The system shall log.", "REQ-002: It shall run."]
+    assert [r["page"] for r in reqs][-2:] == [2, 2]
+
+
+def test_line_by_line_file_matches_whole_text(tmp_path):
+    from src.extractor import extract_requirements
+
+    text = "1.1 Purpose\nREQ-001: The system shall log.\nREQ-002: It shall run.\n"
+    path = tmp_path / "spec.txt"
+    path.write_text(text, encoding="utf-8")
+    expected = ["1.1 Purpose", "REQ-001: The system shall log.", "REQ-002: It shall run."]
+    assert extract_requirements(str(path)) == expected
+    assert extract_requirements(text.encode("utf-8"), "spec.txt") == expected
+
+
+def test_dot_leader_pages_stay_within_the_token_budget():
+    import re
+
+    from src.extractor import PROMPT_RESERVE_TOKENS, max_requirement_chars
+    from src.model_registry import MODEL_SETTINGS
+
+    page = "".join(f"4.{i}.{j}. Scenario parameters {'. ' * 30}{10 + i}\n" for i in range(9) for j in range(9))
+    reqs = list(segment_requirements([(6, "Article 4\nEntry into force\n" + page)], max_chars=max_requirement_chars()))
+    assert len(reqs) > 1
+    budget = MODEL_SETTINGS["n_ctx"] - PROMPT_RESERVE_TOKENS
+    for req in reqs:
+        # Pessimistic count: every digit and punctuation mark is a token of its own
+        assert len(re.findall(r"\d|[^\w\s]|[^\W\d_]+", req["text"])) <= budget
+
+
+def test_article_cross_references_do_not_start_requirements():
+    text = (
+        "Having regard to Regulation (EU) 2019/2144, and in particular\n"
+        "Article 11(2) thereof,\nWhereas:\n(1) The procedures referred to in\n"
+        "Article 11(1) of Regulation (EU) 2019/2144 apply.\n"
+        "Article 1\nScope\nThis Regulation applies to fully automated vehicles.\n"
+        "Article 2 Definitions.\n"
+        "ANNEX I \nInformation document\nThe manufacturer shall declare the ODD.\n"
+    )
+    assert clean_and_split_text(text) == [
+        "Having regard to Regulation (EU) 2019/2144, and in particular Article 11(2) thereof, Whereas: "
+        "(1) The procedures referred to in Article 11(1) of Regulation (EU) 2019/2144 apply.",
+        "Article 1 Scope This Regulation applies to fully automated vehicles.",
+        "Article 2 Definitions.",
+        "ANNEX I Information document The manufacturer shall declare the ODD.",
+    ]
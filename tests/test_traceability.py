@@ -0,0 +1,134 @@
+import pandas as pd
+
+from src.traceability import (
+    build_trace_links,
+    collapse_clusters,
+    render_traceability_html,
+    TraceGraph,
+    simulate_traceability_data,
+    tfidf_similarity,
+    trace_graph,
+)
+
+
+def test_tfidf_similarity_shape_and_self_match():
+    sim = tfidf_similarity(["encrypt data", "login"], ["login screen", "encrypt data", "other"])
+    assert sim.shape == (2, 3)
+    assert sim[0, 1] > 0.99
+    assert sim[1, 0] > sim[1, 2]
+
+
+def test_tfidf_mode_keeps_matrix_columns():
+    sr_df, sysr_df, tc_df = simulate_traceability_data()
+    matrix = build_trace_links(sr_df, sysr_df, tc_df, method="tfidf", threshold=0.1)
+    assert list(matrix.columns) == ["Stakeholder Requirement", "System Requirements", "Test Cases"]
+    assert matrix["Stakeholder Requirement"].tolist() == ["SR-001", "SR-002", "SR-003"]
+    assert "TC-003" in matrix.loc[2, "Test Cases"]
+
+
+def test_top_k_limits_links_per_requirement():
+    sr_df, sysr_df, tc_df = simulate_traceability_data()
+    matrix = build_trace_links(sr_df, sysr_df, tc_df, method="tfidf", threshold=0.0, top_k=1)
+    for cell in matrix["System Requirements"]:
+        assert len(cell.split(", ")) == 1
+    assert matrix.loc[1, "System Requirements"] == "SYSR-002"
+
+
+def test_auto_uses_difflib_for_small_inputs():
+    sr_df = pd.DataFrame({"SR_ID": ["SR-1"], "Description": ["abc"]})
+    sysr_df = pd.DataFrame({"SYSR_ID": ["SYSR-1"], "Description": ["abd"]})
+    tc_df = pd.DataFrame({"TC_ID": ["TC-1"], "Description": ["xyz"]})
+    # "abc" vs "abd" share no 3-gram, but SequenceMatcher ratio is 0.67
+    matrix = build_trace_links(sr_df, sysr_df, tc_df)
+    assert matrix.loc[0, "System Requirements"] == "SYSR-1"
+
+
+def test_llm_linking_only_queries_retrieved_candidates(monkeypatch):
+    import src.traceability as traceability
+
+    asked = []
+
+    def fake_predict(sr_text, candidate_text, level="system"):
+        asked.append((sr_text, candidate_text))
+        return False
+
+    monkeypatch.setattr(traceability, "llm_predict_link", fake_predict)
+    sr_df, sysr_df, tc_df = simulate_traceability_data()
+    matrix = traceability.build_trace_links_llm(sr_df, sysr_df, tc_df, top_k=1)
+    stats = matrix.attrs["llm_stats"]
+    assert len(asked) == stats["link_calls"] == 6
+    assert stats["link_calls_avoided"] == 3 * 8 - 6
+
+
+def _matrix():
+    return pd.DataFrame({
+        "Stakeholder Requirement": ["SR-001", "SR-002"],
+        "System Requirements": ["SYSR-001, SYSR-002", "SYSR-002"],
+        "Test Cases": ["TC-001, TC-002", ""],
+    })
+
+
+def test_trace_graph_has_one_edge_per_link():
+    graph = trace_graph(_matrix())
+    assert graph.number_of_nodes() == 6
+    assert sorted(graph.edges()) == [
+        ("SR-001", "SYSR-001"), ("SR-001", "SYSR-002"), ("SR-001", "TC-001"), ("SR-001", "TC-002"),
+        ("SR-002", "SYSR-002"),
+    ]
+
+
+def test_clusters_collapse_all_but_expanded():
+    view = collapse_clusters(trace_graph(_matrix()), expand=["SR-002"])
+    assert view.nodes["SR-001"]["kind"] == "cluster"
+    assert (view.nodes["SR-001"]["sysr"], view.nodes["SR-001"]["tc"]) == (2, 2)
+    # SYSR-002 is visible through SR-002 and stays linked to the SR-001 cluster
+    assert sorted(view.edges()) == [("SR-001", "SYSR-002"), ("SR-002", "SYSR-002")]
+
+
+def test_rendered_html_has_fixed_layout():
+    html = render_traceability_html(_matrix(), detail="full")
+    assert '"x": ' in html
+    assert '"enabled": false' in html
+
+
+def test_trace_graph_model_queries_and_round_trip():
+    graph = TraceGraph.from_matrix(_matrix(), sysr_ids=["SYSR-001", "SYSR-002", "SYSR-003"],
+                                   tc_ids=["TC-001", "TC-002", "TC-003"])
+    assert graph.untested_requirements() == ["SR-002"]
+    assert graph.orphan_test_cases() == ["TC-003"]
+    assert graph.impact_set("SYSR-002") == {
+        "stakeholder": ["SR-001", "SR-002"], "system": ["SYSR-001"], "tests": ["TC-001", "TC-002"]
+    }
+    assert graph.coverage()["stakeholder_tested"] == 50.0
+    assert graph.to_matrix().equals(_matrix())
+
+
+def test_trace_graph_incremental_updates():
+    graph = TraceGraph.from_matrix(_matrix())
+    graph.add_link("SR-002", "TC-003", "tc")
+    assert graph.untested_requirements() == []
+    graph.remove_link("SR-002", "TC-003", "tc")
+    assert graph.untested_requirements() == ["SR-002"]
+    assert graph.orphan_test_cases() == ["TC-003"]
+
+    graph.remove_node("sr", "SR-001")
+    assert graph.linked_requirements("SYSR-002", "sysr") == ["SR-002"]
+    assert graph.orphans("sysr") == ["SYSR-001"]
+    assert graph.coverage()["stakeholder_realised"] == 100.0
+
+
+def test_default_thresholds_are_calibrated_per_method():
+    import os
+
+    data = os.path.join(os.path.dirname(__file__), "..", "data")
+    sr_df, sysr_df, tc_df = (pd.read_csv(os.path.join(data, f"Extended_{name}.csv"))
+                             for name in ("Stakeholder_Requirements", "System_Requirements", "Test_Cases"))
+
+    def links(method):
+        matrix = build_trace_links(sr_df, sysr_df, tc_df, method=method)
+        return {(sr, link) for sr, *cells in matrix.itertuples(index=False) for cell in cells
+                for link in cell.split(", ") if link}
+
+    difflib, tfidf = links("difflib"), links("tfidf")
+    assert 0.8 <= len(tfidf) / len(difflib) <= 1.25
+    assert len(tfidf & difflib) >= 0.8 * len(difflib)